@@ -0,0 +1,227 @@
+"""
+Circuit breaker por backend (Supabase / MongoDB) e roteamento de escritas
+
+Cada backend tem um CircuitBreaker que acompanha as últimas chamadas:
+- closed: tudo normal, chamadas passam
+- open: taxa de falhas passou do limite; o backend é pulado até o fim do
+  tempo de espera
+- half_open: espera terminou; uma única chamada de teste (a próxima roteada
+  ou o probe periódico) testa o backend - sucesso fecha o circuito, falha
+  abre de novo. Enquanto o teste está em andamento, as outras chamadas
+  pulam o backend como se o circuito estivesse aberto
+
+BackendRouter.route() gera os backends na ordem em que devem ser tentados,
+pulando os que estão com o circuito aberto. A chamada de teste de um
+backend em half_open só é reservada quando quem chama chega nele: se o
+backend preferido responder, o teste do seguinte fica livre para o probe.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+from structured_logging import get_logger
+
+log = get_logger("backend_router")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        enabled: bool = True,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        open_seconds: float = 30.0,
+        latency_samples: int = 200,
+        trial_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.trial_timeout = trial_timeout  # teste em half_open sem resultado libera a vaga depois disso
+
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=latency_samples)
+        self._opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+
+        self.total_calls = 0
+        self.total_failures = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return OPEN
+
+    def set_window(self, window: int):
+        """Muda o tamanho da janela de chamadas, mantendo as mais recentes"""
+        if window != self._outcomes.maxlen:
+            self._outcomes = deque(self._outcomes, maxlen=window)
+
+    def _trial_in_flight(self) -> bool:
+        return self._trial_started is not None and time.monotonic() - self._trial_started < self.trial_timeout
+
+    def allow(self) -> bool:
+        """O backend pode ser tentado agora? (closed, ou half_open sem teste em andamento)"""
+        if not self.enabled:
+            return False
+        state = self.state
+        if state == HALF_OPEN:
+            return not self._trial_in_flight()
+        return state == CLOSED
+
+    def acquire(self) -> bool:
+        """Como allow(), mas em half_open reserva a chamada de teste para quem chamou"""
+        if not self.allow():
+            return False
+        if self.state == HALF_OPEN:
+            self._trial_started = time.monotonic()
+        return True
+
+    def record(self, success: bool, duration: float, error: Optional[str] = None):
+        """Registra o resultado de uma chamada (duration em segundos)"""
+        self.total_calls += 1
+        self._trial_started = None
+        self._latencies.append(duration * 1000)
+
+        if success:
+            if self._opened_at is not None:
+                # Teste em half_open deu certo: fechar e recomeçar a janela
+                log.info("✅ Circuito %s fechado", self.name)
+                self._opened_at = None
+                self._outcomes.clear()
+            self._outcomes.append(True)
+            return
+
+        self.total_failures += 1
+        self.last_error = error[:200] if error else error
+        self._outcomes.append(False)
+
+        if self._opened_at is not None:
+            # Falhou em half_open (ou chamada atrasada em open): nova espera
+            self._opened_at = time.monotonic()
+            return
+
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+            log.warning("⚡ Circuito %s aberto (%s/%s falhas): %s", self.name, failures, len(self._outcomes), error)
+
+    async def call(self, fn: Callable[..., Awaitable], *args, **kwargs):
+        """Executa fn registrando sucesso/falha e latência"""
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self.record(False, time.perf_counter() - started, str(e))
+            raise
+        self.record(True, time.perf_counter() - started)
+        return result
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        failures = self._outcomes.count(False)
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "recent_failure_rate": round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+            "total_calls": self.total_calls,
+            "total_failures": self.total_failures,
+            "times_opened": self.times_opened,
+            "last_error": self.last_error,
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "samples": len(latencies),
+            },
+        }
+
+
+class BackendRouter:
+    def __init__(self, breakers: List[CircuitBreaker], probe_interval: float = 10.0, probe_timeout: float = 3.0):
+        # Ordem da lista = ordem de preferência
+        self.breakers: Dict[str, CircuitBreaker] = {breaker.name: breaker for breaker in breakers}
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self._probes: Dict[str, Callable[[], Awaitable]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __getitem__(self, name: str) -> CircuitBreaker:
+        return self.breakers[name]
+
+    def route(self) -> Iterator[str]:
+        """
+        Backends a tentar, em ordem de preferência, pulando circuitos abertos
+        (e os em half_open cuja chamada de teste já foi reservada)
+        Gerador: cada backend é reservado só quando o loop de quem chama chega
+        nele, então um break após o sucesso não prende o teste dos seguintes
+        Se todos estiverem abertos, tenta os habilitados mesmo assim
+        """
+        routed = False
+        for name, breaker in self.breakers.items():
+            if breaker.acquire():
+                routed = True
+                yield name
+        if not routed:
+            yield from (name for name, breaker in self.breakers.items() if breaker.enabled)
+
+    # ---- probe periódico ----
+
+    def start(self, probes: Dict[str, Callable[[], Awaitable]]):
+        """Inicia o probe: testa backends em half_open sem esperar tráfego real"""
+        self._probes = probes
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _probe(self, name: str):
+        breaker = self.breakers[name]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._probes[name](), timeout=self.probe_timeout)
+        except Exception as e:
+            breaker.record(False, time.perf_counter() - started, f"probe: {str(e) or type(e).__name__}")
+            return
+        breaker.record(True, time.perf_counter() - started)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            for name in self._probes:
+                breaker = self.breakers[name]
+                # Com uma chamada de teste já em andamento, o probe espera o resultado dela
+                if breaker.enabled and breaker.state == HALF_OPEN and breaker.acquire():
+                    await self._probe(name)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
@@ -0,0 +1,226 @@
+"""
+MongoDB em memória para benchmarks (quando não há um mongod local)
+
+Imita só a parte da API do Motor que o server.py usa: insert_one/many,
+find().sort().skip().limit().to_list(), count_documents,
+estimated_document_count, aggregate ($group por campo), find_one_and_*,
+bulk_write com UpdateOne(upsert) / DeleteMany / UpdateMany, create_indexes e
+db.command (ping / explain). Filtros: igualdade, $in, $lt/$lte/$gt/$gte, $or.
+
+Sem change streams (watch levanta OperationFailure, como num standalone).
+"""
+import itertools
+from types import SimpleNamespace
+
+from pymongo import DeleteMany, DeleteOne, UpdateMany, UpdateOne
+from pymongo.errors import OperationFailure
+
+_OPERATORS = {
+    "$in": lambda value, arg: value in arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$ne": lambda value, arg: value != arg,
+}
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, expected in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in expected):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in expected):
+                return False
+        elif isinstance(expected, dict) and expected and all(op.startswith("$") for op in expected):
+            if not all(_OPERATORS[op](doc.get(key), arg) for op, arg in expected.items()):
+                return False
+        elif doc.get(key) != expected:
+            return False
+    return True
+
+
+def project(doc: dict, projection) -> dict:
+    if not projection:
+        return dict(doc)
+    included = [key for key, flag in projection.items() if flag and key != "_id"]
+    if included:
+        result = {key: doc[key] for key in included if key in doc}
+        if projection.get("_id", 1):
+            result["_id"] = doc["_id"]
+        return result
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+
+class FakeCursor:
+    def __init__(self, docs, projection=None):
+        self._docs = docs
+        self._projection = projection
+
+    def sort(self, key, direction=None):
+        keys = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda doc: (doc.get(field) is None, doc.get(field)), reverse=order < 0)
+        return self
+
+    def skip(self, count: int):
+        self._docs = self._docs[count:]
+        return self
+
+    def limit(self, count: int):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    async def to_list(self, length=None):
+        docs = self._docs if length is None else self._docs[:length]
+        return [project(doc, self._projection) for doc in docs]
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return project(next(self._iter), self._projection)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeAggregation:
+    def __init__(self, docs, pipeline):
+        self._docs = docs
+        self._pipeline = pipeline
+
+    async def to_list(self, length=None):
+        docs = self._docs
+        for stage in self._pipeline:
+            if "$match" in stage:
+                docs = [doc for doc in docs if matches(doc, stage["$match"])]
+            elif "$group" in stage:
+                field = stage["$group"]["_id"].lstrip("$")
+                groups = {}
+                for doc in docs:
+                    groups[doc.get(field)] = groups.get(doc.get(field), 0) + 1
+                docs = [{"_id": key, "count": count} for key, count in groups.items()]
+        return docs
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self.docs = []
+        self._ids = itertools.count(1)
+
+    def _store(self, doc: dict):
+        doc.setdefault("_id", next(self._ids))
+        self.docs.append(doc)
+
+    def _matching(self, query):
+        return [doc for doc in self.docs if matches(doc, query or {})]
+
+    async def insert_one(self, doc: dict):
+        self._store(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            self._store(doc)
+        return SimpleNamespace(inserted_ids=[doc["_id"] for doc in docs])
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(self._matching(query), projection)
+
+    async def find_one(self, query=None, projection=None):
+        found = self._matching(query)
+        return project(found[0], projection) if found else None
+
+    async def count_documents(self, query):
+        return len(self._matching(query))
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+    def aggregate(self, pipeline):
+        return FakeAggregation(self.docs, pipeline)
+
+    async def update_one(self, query, update, upsert=False):
+        found = self._matching(query)
+        if found:
+            found[0].update(update.get("$set", {}))
+        elif upsert:
+            self._store({**query, **update.get("$setOnInsert", {}), **update.get("$set", {})})
+        return SimpleNamespace(matched_count=len(found[:1]), modified_count=len(found[:1]), upserted_id=None)
+
+    async def find_one_and_update(self, query, update, projection=None):
+        found = self._matching(query)
+        if not found:
+            return None
+        before = project(found[0], projection)
+        found[0].update(update.get("$set", {}))
+        return before
+
+    async def find_one_and_delete(self, query, projection=None):
+        found = self._matching(query)
+        if not found:
+            return None
+        self.docs.remove(found[0])
+        return project(found[0], projection)
+
+    async def delete_one(self, query):
+        found = self._matching(query)
+        if found:
+            self.docs.remove(found[0])
+        return SimpleNamespace(deleted_count=len(found[:1]))
+
+    async def bulk_write(self, requests, ordered=True):
+        upserted = matched = deleted = 0
+        for request in requests:
+            query = request._filter
+            if isinstance(request, (UpdateOne, UpdateMany)):
+                spec = request._doc
+                found = self._matching(query)
+                found = found if isinstance(request, UpdateMany) else found[:1]
+                for doc in found:
+                    doc.update(spec.get("$set", {}))
+                matched += len(found)
+                if not found and request._upsert:
+                    self._store({**query, **spec.get("$setOnInsert", {}), **spec.get("$set", {})})
+                    upserted += 1
+            elif isinstance(request, (DeleteOne, DeleteMany)):
+                found = self._matching(query)
+                found = found if isinstance(request, DeleteMany) else found[:1]
+                for doc in found:
+                    self.docs.remove(doc)
+                deleted += len(found)
+        return SimpleNamespace(upserted_count=upserted, matched_count=matched, modified_count=matched, deleted_count=deleted)
+
+    async def create_indexes(self, models):
+        return [model.document["name"] for model in models]
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, *args, **kwargs):
+        if isinstance(command, dict) and "explain" in command:
+            return {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}
+        return {"ok": 1.0}
@@ -0,0 +1,262 @@
+"""
+PostgREST/Supabase falso para benchmarks
+
+Servidor HTTP local, em memória, que responde o subconjunto do PostgREST que
+o server.py usa (filtros eq/neq/in/is/lt/gt/ilike, or=(...)/and(...), order,
+limit/offset, select de colunas, Prefer: count=exact, return=representation,
+resolution=ignore-duplicates com on_conflict).
+
+Latência e erros são injetados por request:
+    --latency-ms 20 --jitter-ms 5   espera 20±5 ms antes de responder
+    --error-rate 0.05               5% das respostas são 503
+
+Uso (normalmente iniciado pelo benchmarks/run.py):
+    python benchmarks/fake_supabase.py --port 54321 --reviews 300
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from fnmatch import fnmatch
+
+import uvicorn
+from starlette.requests import Request
+from starlette.responses import Response
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from review_dedup import content_hash  # noqa: E402 - mesmo hash gravado pela ingestão real
+
+SKIP_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def split_top_level(expr: str):
+    """Separa por vírgulas de primeiro nível (respeitando aspas e parênteses)"""
+    parts, buf, depth, quoted, escaped = [], "", 0, False, False
+    for ch in expr:
+        if escaped:
+            buf += ch
+            escaped = False
+            continue
+        if ch == "\\" and quoted:
+            buf += ch
+            escaped = True
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append(buf)
+            buf = ""
+        else:
+            buf += ch
+    if buf:
+        parts.append(buf)
+    return parts
+
+
+def unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def match(row: dict, column: str, expr: str) -> bool:
+    op, _, value = expr.partition(".")
+    if op == "not":
+        return not match(row, column, value)
+    current = row.get(column)
+    if op == "eq":
+        value = unquote(value)
+        if value in ("true", "false"):
+            return current == (value == "true")
+        return str(current) == value
+    if op == "neq":
+        return str(current) != unquote(value)
+    if op == "ilike":
+        return current is not None and fnmatch(str(current).lower(), unquote(value).lower().replace("%", "*"))
+    if op == "in":
+        inner = value.strip()[1:-1]
+        return str(current) in {unquote(item) for item in split_top_level(inner)}
+    if op in ("gt", "lt", "gte", "lte"):
+        if current is None:
+            return False
+        value = unquote(value)
+        if isinstance(current, (int, float)) and not isinstance(current, bool):
+            left, right = current, type(current)(value)
+        else:
+            left, right = str(current), value
+        return {"gt": left > right, "lt": left < right, "gte": left >= right, "lte": left <= right}[op]
+    if op == "is":
+        return current is None if value == "null" else current == (value == "true")
+    raise ValueError(f"operador não suportado: {op}")
+
+
+def condition(row: dict, expr: str) -> bool:
+    expr = expr.strip()
+    for kind in ("or", "and"):
+        if expr.startswith(kind + "("):
+            return logic(row, kind, expr[len(kind):])
+    column, _, rest = expr.partition(".")
+    return match(row, column, rest)
+
+
+def logic(row: dict, kind: str, expr: str) -> bool:
+    results = (condition(row, part) for part in split_top_level(expr.strip()[1:-1]))
+    return any(results) if kind == "or" else all(results)
+
+
+class FakeSupabase:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.tables = {}
+        self._ids = itertools.count(1)
+        self.requests = 0
+        self.injected_errors = 0
+
+    def seed_reviews(self, count: int):
+        start = datetime(2024, 1, 1)
+        rows = self.tables.setdefault("google_reviews", [])
+        for i in range(count):
+            author, rating, text = f"Customer {i}", 5 - (i % 3 == 0), f"Great cleaning service, visit {i}"
+            rows.append({
+                "id": next(self._ids),
+                "review_id": f"seed_{i}",
+                "author_name": author,
+                "rating": rating,
+                "text": text,
+                "relative_time_description": "a month ago",
+                "profile_photo_url": None,
+                "review_time": (start + timedelta(hours=i)).isoformat(),
+                "content_hash": content_hash(author, rating, text),
+                "is_active": True,
+            })
+
+    def _filter(self, table: str, params):
+        rows = self.tables.get(table, [])
+        for key, value in params.multi_items():
+            if key in SKIP_PARAMS:
+                continue
+            if key in ("or", "and"):
+                rows = [row for row in rows if logic(row, key, value)]
+            else:
+                rows = [row for row in rows if match(row, key, value)]
+        return list(rows)
+
+    @staticmethod
+    def _select(rows, select: str):
+        if select in ("", "*"):
+            return rows
+        columns = select.split(",")
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        response = await self.handle(Request(scope, receive))
+        await response(scope, receive, send)
+
+    async def handle(self, request: Request) -> Response:
+        self.requests += 1
+        if self.latency_ms or self.jitter_ms:
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            await asyncio.sleep(max(0.0, delay) / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            self.injected_errors += 1
+            return Response('{"message": "injected error"}', status_code=503, media_type="application/json")
+
+        table = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        params = request.query_params
+        prefer = request.headers.get("prefer", "")
+        handler = getattr(self, f"_{request.method.lower()}", None)
+        if handler is None:
+            return Response(status_code=405)
+        status, payload, headers = handler(table, params, prefer, await request.body())
+        body = b"" if payload is None else json.dumps(payload, default=str).encode()
+        return Response(body, status_code=status, headers=headers, media_type="application/json")
+
+    def _get(self, table, params, prefer, body):
+        rows = self._filter(table, params)
+        total = len(rows)
+        for item in reversed([o for o in params.get("order", "").split(",") if o]):
+            column, _, direction = item.partition(".")
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction.startswith("desc"))
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        rows = rows[offset:offset + int(limit)] if limit else rows[offset:]
+        headers = {}
+        if "count=" in prefer:
+            headers["content-range"] = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+        return 200, self._select(rows, params.get("select", "*")), headers
+
+    def _post(self, table, params, prefer, body):
+        items = json.loads(body)
+        items = items if isinstance(items, list) else [items]
+        rows = self.tables.setdefault(table, [])
+        conflict = params.get("on_conflict")
+        existing = {row.get(conflict) for row in rows} if conflict else set()
+        created = []
+        for item in items:
+            if conflict and item.get(conflict) in existing:
+                if "ignore-duplicates" in prefer:
+                    continue
+                return 409, {"message": "duplicate key value violates unique constraint"}, {}
+            row = {"id": next(self._ids), "created_at": datetime.utcnow().isoformat(), **item}
+            rows.append(row)
+            created.append(row)
+            if conflict:
+                existing.add(row.get(conflict))
+        if "return=representation" in prefer:
+            return 201, self._select(created, params.get("select", "*")), {}
+        return 201, None, {}
+
+    def _patch(self, table, params, prefer, body):
+        update = json.loads(body)
+        rows = self._filter(table, params)
+        for row in rows:
+            row.update(update)
+        if "return=representation" in prefer:
+            return 200, self._select(rows, params.get("select", "*")), {}
+        return 204, None, {}
+
+    def _delete(self, table, params, prefer, body):
+        rows = self._filter(table, params)
+        removed = {id(row) for row in rows}
+        self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in removed]
+        if "return=representation" in prefer:
+            return 200, self._select(rows, params.get("select", "*")), {}
+        return 204, None, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reviews", type=int, default=300, help="reviews criados no início")
+    args = parser.parse_args()
+
+    app = FakeSupabase(args.latency_ms, args.jitter_ms, args.error_rate)
+    app.seed_reviews(args.reviews)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Benchmark do backend FastAPI (server.py) com substitutos locais
+
+Sobe o Supabase falso (fake_supabase.py, com latência/erros injetados) e o
+server.py (serve.py, com MongoDB em memória ou um mongod local), e dispara
+cada cenário em cada nível de concorrência (clientes em loop fechado por
+--duration segundos). Reporta p50/p95/p99, requests por segundo e erros, e
+salva tudo em JSON para comparar execuções.
+
+Cenários:
+    contact        POST /api/contact (payload único por request)
+    reviews        GET /api/reviews
+    reviews_stats  GET /api/reviews/stats
+    leads          GET /api/leads?limit=50
+    webhook        POST /api/webhook/reviews-update (metade novos, metade repetidos)
+
+Exemplos:
+    python benchmarks/run.py
+    python benchmarks/run.py --concurrency 1,10,50 --duration 15 --latency-ms 30 --error-rate 0.02
+    python benchmarks/run.py --scenarios reviews,leads --baseline benchmarks/results/anterior.json
+
+O gerador de carga roda em um único processo Python: em concorrência alta
+ele mesmo pode virar o gargalo (compare o RPS com o uso de CPU dos processos).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+WEBHOOK_BATCH = 20
+
+_sequence = itertools.count(1)
+
+
+def contact_request():
+    n = next(_sequence)
+    # Email único: o mesmo formulário repetido seria deduplicado pela idempotência
+    return "POST", "/api/contact", {
+        "name": f"Benchmark {n}",
+        "phone": f"555{n:07d}",
+        "email": f"bench{n}@example.com",
+        "message": "Benchmark request",
+        "sms_consent": True,
+        "source": "benchmark",
+    }
+
+
+def webhook_request():
+    n = next(_sequence)
+    repeated = [
+        {"author_name": f"Repeat {i}", "rating": 5, "text": f"Always great {i}", "review_time": "2025-01-01T10:00:00Z"}
+        for i in range(WEBHOOK_BATCH // 2)
+    ]
+    new = [
+        {"author_name": f"New {n}-{i}", "rating": 4, "text": f"Benchmark review {n}-{i}", "review_time": "2025-02-01T10:00:00Z"}
+        for i in range(WEBHOOK_BATCH - len(repeated))
+    ]
+    return "POST", "/api/webhook/reviews-update", {
+        "action": "reviews_update",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "business_name": "Santos Cleaning Solutions",
+        "total_reviews": WEBHOOK_BATCH,
+        "average_rating": 4.5,
+        "user_ratings_total": WEBHOOK_BATCH,
+        "reviews": repeated + new,
+    }
+
+
+SCENARIOS = {
+    "contact": contact_request,
+    "reviews": lambda: ("GET", "/api/reviews", None),
+    "reviews_stats": lambda: ("GET", "/api/reviews/stats", None),
+    "leads": lambda: ("GET", "/api/leads?limit=50", None),
+    "webhook": webhook_request,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por posição (nearest-rank) de uma lista já ordenada"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} não respondeu em {timeout:.0f}s")
+
+
+async def run_level(base_url: str, scenario: str, concurrency: int, duration: float, warmup: int) -> dict:
+    make_request = SCENARIOS[scenario]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def send():
+            method, path, body = make_request()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            return time.perf_counter() - started, status
+
+        for _ in range(warmup):
+            await send()
+
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                elapsed, status = await send()
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.startswith(("2", "3")))
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "error_rate": round((len(latencies) - ok) / len(latencies), 4) if latencies else 0.0,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+def print_table(results: List[dict], baseline: Dict[tuple, dict]):
+    header = f"{'cenário':<14} {'conc':>5} {'reqs':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>6}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        line = (
+            f"{result['scenario']:<14} {result['concurrency']:>5} {result['requests']:>7} {result['rps']:>9.1f} "
+            f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>6}"
+        )
+        previous = baseline.get((result["scenario"], result["concurrency"]))
+        if previous:
+            def delta(key):
+                return f"{(result[key] - previous[key]) / previous[key] * 100:+.0f}%" if previous[key] else "n/a"
+            line += f"   vs baseline: rps {delta('rps')}, p95 {delta('p95_ms')}, p99 {delta('p99_ms')}"
+        print(line)
+
+
+def start_process(args: List[str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT_DIR)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="cenários separados por vírgula")
+    parser.add_argument("--concurrency", default="1,10,50", help="níveis de concorrência, ex.: 1,10,50")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por cenário/nível")
+    parser.add_argument("--warmup", type=int, default=20, help="requests de aquecimento por cenário/nível")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latência do Supabase falso")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de 503 do Supabase falso")
+    parser.add_argument("--reviews", type=int, default=300, help="reviews iniciais no Supabase falso")
+    parser.add_argument("--mongo-url", default=None, help="mongod local; sem ele usa o MongoDB em memória")
+    parser.add_argument("--output", default=None, help="arquivo JSON (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(unknown)}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    supabase_port, app_port = free_port(), free_port()
+    supabase_url = f"http://127.0.0.1:{supabase_port}"
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    fake = start_process([
+        os.path.join(BENCHMARKS_DIR, "fake_supabase.py"), "--port", str(supabase_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--reviews", str(args.reviews),
+    ])
+    app_args = [os.path.join(BENCHMARKS_DIR, "serve.py"), "--port", str(app_port), "--supabase-url", supabase_url]
+    if args.mongo_url:
+        app_args += ["--mongo-url", args.mongo_url]
+    app = start_process(app_args)
+
+    results = []
+    try:
+        await wait_ready(supabase_url)
+        await wait_ready(f"{base_url}/")
+        for scenario in scenarios:
+            for level in levels:
+                print(f"▶️ {scenario} com {level} clientes por {args.duration:.0f}s...", flush=True)
+                results.append(await run_level(base_url, scenario, level, args.duration, args.warmup))
+    finally:
+        for process in (app, fake):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "duration_seconds": args.duration,
+            "warmup_requests": args.warmup,
+            "concurrency": levels,
+            "supabase_latency_ms": args.latency_ms,
+            "supabase_jitter_ms": args.jitter_ms,
+            "supabase_error_rate": args.error_rate,
+            "seed_reviews": args.reviews,
+            "mongo": args.mongo_url or "in-memory",
+        },
+        "results": results,
+    }
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    print_table(results, baseline)
+    print(f"\n💾 Resultados salvos em {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""
+Sobe o server.py para benchmark, apontado para os substitutos locais
+
+- Supabase: --supabase-url (normalmente o benchmarks/fake_supabase.py)
+- MongoDB: --mongo-url de um mongod local, ou, sem ele, o MongoDB em
+  memória do benchmarks/fake_mongo.py
+
+As demais configurações vêm do ambiente, como no server.py (ex.:
+CONTACT_WRITE_MODE=spool, REVIEWS_WEBHOOK_MODE=concurrent, LOG_LEVEL). Os
+arquivos locais (réplica de leitura e fila de contatos) ficam num diretório
+temporário: os dados falsos nunca chegam aos arquivos reais do projeto.
+
+Uso (normalmente iniciado pelo benchmarks/run.py):
+    python benchmarks/serve.py --port 8011 --supabase-url http://127.0.0.1:54321
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import uvicorn
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--supabase-url", required=True)
+    parser.add_argument("--mongo-url", default=None, help="mongod local; sem ele usa o MongoDB em memória")
+    args = parser.parse_args()
+
+    # Definidas antes do import: o .env do projeto não sobrescreve o ambiente
+    os.environ["SUPABASE_URL"] = args.supabase_url
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "benchmark"
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://127.0.0.1:1"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    with tempfile.TemporaryDirectory(prefix="santos-bench-") as workdir:
+        os.environ["READ_REPLICA_PATH"] = os.path.join(workdir, "read_replica.db")
+        os.environ["CONTACT_SPOOL_PATH"] = os.path.join(workdir, "contact_spool.db")
+
+        sys.path[:0] = [ROOT_DIR, BENCHMARKS_DIR]
+        import server
+
+        if not args.mongo_url:
+            from fake_mongo import FakeDatabase
+            server.db = FakeDatabase()
+
+        uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Fila write-behind para o formulário de contato
+
+No modo "spool", POST /api/contact grava o lead num arquivo SQLite local
+(WAL, append-only) e responde na hora. Um worker em background drena a fila
+em lotes para o Supabase (ou MongoDB), com novas tentativas e backoff
+exponencial. Se o processo cair, os leads continuam no arquivo e são
+entregues no próximo start.
+
+A entrega precisa ser idempotente (o lead já tem id próprio): um lote pode
+ser reenviado se o processo cair entre a entrega e a remoção da fila.
+
+Lote que volta a falhar é reenviado em metades (batch_size >> tentativas),
+então um lead que o backend sempre recusa (ex.: 4xx) acaba isolado; depois
+de max_attempts tentativas ele sai da fila para contact_spool_dead, sem
+segurar os outros.
+"""
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from structured_logging import get_logger
+
+log = get_logger("contact_spool")
+
+
+class ContactSpool:
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 50,
+        poll_interval: float = 5.0,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        max_attempts: int = 10,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Estado da fila em memória, atualizado por quem escreve (sob _lock):
+        # stats() não consulta o arquivo
+        self.depth = 0
+        self.retrying = 0
+        self.dead_letters = 0
+        self._oldest_enqueued_at: Optional[float] = None
+
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.last_error: Optional[str] = None
+        self.last_drain_at: Optional[float] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS contact_spool (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    lead_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS contact_spool_due_idx ON contact_spool (next_attempt_at, seq)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS contact_spool_dead (
+                    seq INTEGER PRIMARY KEY,
+                    lead_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    failed_at REAL NOT NULL,
+                    last_error TEXT
+                )
+                """
+            )
+            self.depth, retrying = conn.execute(
+                "SELECT COUNT(*), SUM(CASE WHEN attempts > 0 THEN 1 ELSE 0 END) FROM contact_spool"
+            ).fetchone()
+            self.retrying = retrying or 0
+            self.dead_letters = conn.execute("SELECT COUNT(*) FROM contact_spool_dead").fetchone()[0]
+            self._oldest_enqueued_at = self._first_enqueued_at(conn)
+            self._conn = conn
+        return self._conn
+
+    def _first_enqueued_at(self, conn: sqlite3.Connection) -> Optional[float]:
+        row = conn.execute("SELECT enqueued_at FROM contact_spool ORDER BY seq LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    # ---- fila ----
+
+    def _insert(self, lead_id: str, payload: str):
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO contact_spool (lead_id, payload, enqueued_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (lead_id, payload, now, now),
+            )
+            self.depth += 1
+            if self._oldest_enqueued_at is None:
+                self._oldest_enqueued_at = now
+
+    async def enqueue(self, lead_id: str, payload: dict):
+        """Grava o lead no arquivo (durável ao retornar) e acorda o worker"""
+        await asyncio.to_thread(self._insert, lead_id, json.dumps(payload, default=str))
+        self.enqueued += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _due(self) -> List[tuple]:
+        rows = self._execute(
+            "SELECT seq, payload, attempts FROM contact_spool WHERE next_attempt_at <= ? ORDER BY seq LIMIT ?",
+            (time.time(), self.batch_size),
+        )
+        if rows and rows[0][2]:
+            # Reenvio: metade do lote a cada falha, até isolar o lead que falha
+            rows = rows[:max(1, self.batch_size >> rows[0][2])]
+        return rows
+
+    def _remove(self, rows: List[tuple]):
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"DELETE FROM contact_spool WHERE seq IN ({placeholders})", [seq for seq, _, _ in rows])
+            self.depth -= len(rows)
+            self.retrying -= sum(1 for _, _, attempts in rows if attempts)
+            self._oldest_enqueued_at = self._first_enqueued_at(conn)
+
+    def _reschedule(self, rows: List[tuple], error: str) -> int:
+        """Agenda nova tentativa (backoff); quem chegou a max_attempts vai para a dead letter. Retorna quantos foram"""
+        now = time.time()
+        dead = [seq for seq, _, attempts in rows if attempts + 1 >= self.max_attempts]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                for seq, _, attempts in rows:
+                    delay = min(self.max_backoff, self.base_backoff * (2 ** attempts))
+                    delay *= random.uniform(0.8, 1.2)
+                    conn.execute(
+                        "UPDATE contact_spool SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE seq = ?",
+                        (attempts + 1, now + delay, error[:500], seq),
+                    )
+                if dead:
+                    placeholders = ",".join("?" * len(dead))
+                    conn.execute(
+                        f"""
+                        INSERT OR REPLACE INTO contact_spool_dead (seq, lead_id, payload, enqueued_at, attempts, failed_at, last_error)
+                        SELECT seq, lead_id, payload, enqueued_at, attempts, ?, last_error FROM contact_spool WHERE seq IN ({placeholders})
+                        """,
+                        [now, *dead],
+                    )
+                    conn.execute(f"DELETE FROM contact_spool WHERE seq IN ({placeholders})", dead)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            # Linhas que falharam pela primeira vez passam a contar como retrying; as mortas saem da fila
+            self.retrying += sum(1 for _, _, attempts in rows if not attempts) - len(dead)
+            self.depth -= len(dead)
+            self.dead_letters += len(dead)
+            if dead:
+                self._oldest_enqueued_at = self._first_enqueued_at(conn)
+        return len(dead)
+
+    async def drain_once(self, deliver: Callable[[List[dict]], Awaitable[None]]) -> int:
+        """Entrega um lote de leads vencidos; retorna quantos foram entregues"""
+        rows = await asyncio.to_thread(self._due)
+        if not rows:
+            return 0
+
+        try:
+            await deliver([json.loads(payload) for _, payload, _ in rows])
+        except Exception as e:
+            self.failed_attempts += 1
+            self.last_error = str(e)
+            log.warning("⚠️ Falha ao drenar fila de contatos (%s leads): %s", len(rows), e)
+            dead = await asyncio.to_thread(self._reschedule, rows, str(e))
+            if dead:
+                log.error("❌ %s leads movidos para contact_spool_dead após %s tentativas: %s", dead, self.max_attempts, e)
+            return 0
+
+        await asyncio.to_thread(self._remove, rows)
+        self.delivered += len(rows)
+        self.last_drain_at = time.time()
+        log.info("📤 %s leads da fila entregues", len(rows))
+        return len(rows)
+
+    # ---- worker ----
+
+    def start(self, deliver: Callable[[List[dict]], Awaitable[None]]):
+        if self._worker is not None:
+            return
+        self._connect()
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.create_task(self._run(deliver))
+
+    async def _run(self, deliver):
+        while True:
+            try:
+                # Lote cheio: provavelmente há mais leads vencidos, drenar de novo
+                if await self.drain_once(deliver) == self.batch_size:
+                    continue
+            except Exception as e:
+                log.exception("❌ Erro no worker da fila de contatos: %s", e)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self, deliver: Optional[Callable[[List[dict]], Awaitable[None]]] = None):
+        """Para o worker; com deliver, tenta uma última drenagem antes de sair"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if deliver is not None:
+            try:
+                await self.drain_once(deliver)
+            except Exception as e:
+                log.warning("⚠️ Drenagem final da fila de contatos falhou: %s", e)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        now = time.time()
+        oldest = self._oldest_enqueued_at
+        return {
+            "path": self.path,
+            "running": self._worker is not None,
+            "depth": self.depth,
+            "retrying": self.retrying,
+            "dead_letters": self.dead_letters,
+            "drain_lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed_attempts": self.failed_attempts,
+            "last_error": self.last_error,
+            "last_drain_seconds_ago": round(now - self.last_drain_at, 3) if self.last_drain_at else None,
+        }
@@ -0,0 +1,40 @@
+"""
+Serialização JSON rápida
+
+Usa orjson quando instalado (opcional) e cai para o json da biblioteca
+padrão caso contrário. A saída é JSON compacto em UTF-8 nos dois casos;
+datetime vira ISO 8601.
+
+FastJSONResponse é a classe de resposta padrão do app.
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada com orjson (ou json, se orjson não estiver instalado)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,58 @@
+"""
+Respostas HTTP cacheáveis para as rotas públicas de leitura
+
+- ETag forte calculado sobre os bytes do JSON da resposta
+- If-None-Match igual ao ETag atual -> 304 Not Modified, sem corpo
+- Cache-Control por rota (max-age para o navegador, s-maxage para a CDN
+  da Netlify), configurado em settings
+
+RenderedJSON é um corpo já codificado com seu ETag: quem tem um payload que
+muda raramente (ex.: reviews no SWRCache) guarda o RenderedJSON em vez do
+dict, e cada request só devolve os bytes prontos.
+"""
+import hashlib
+from typing import Any, Optional, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from fast_json import dumps
+
+# Respostas de fallback/erro não devem ficar presas na CDN
+NO_STORE = "no-store"
+
+
+def compute_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca, como o If-None-Match exige (W/"x" casa com "x")"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class RenderedJSON:
+    """Corpo JSON codificado + ETag, calculados uma única vez"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, payload: Any):
+        self.body = dumps(payload)
+        self.etag = compute_etag(self.body)
+
+
+def cached_json_response(request: Request, payload: Union[RenderedJSON, Any], cache_control: str) -> Response:
+    """
+    Resposta JSON com ETag/Cache-Control, ou 304 se o cliente já tem esta versão
+    `payload` pode ser um RenderedJSON (bytes prontos) ou um objeto a serializar
+    """
+    rendered = payload if isinstance(payload, RenderedJSON) else RenderedJSON(payload)
+    headers = {"ETag": rendered.etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), rendered.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
@@ -0,0 +1,129 @@
+"""
+Idempotência para POST /api/contact e /api/bookings
+
+Duplo clique ou retry em rede lenta não deve criar dois leads/bookings. Cada
+submissão recebe uma chave:
+- header `Idempotency-Key`, quando o cliente envia
+- senão, hash de email + telefone + payload (mesmo formulário reenviado
+  dentro da janela = mesma submissão)
+
+A resposta da primeira submissão fica num LRU limitado com TTL; repetições
+devolvem essa resposta sem tocar no Supabase/MongoDB. Uma repetição que chega
+enquanto a primeira ainda está gravando espera o resultado dela. Falhas não
+ficam guardadas: o retry tenta de novo.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from structured_logging import get_logger
+
+log = get_logger("idempotency")
+
+
+class IdempotencyKeyReused(Exception):
+    """Mesma Idempotency-Key enviada com outro payload"""
+
+
+def payload_fingerprint(payload: dict) -> str:
+    """Hash do payload; email sem maiúsculas e telefone só com dígitos"""
+    normalized = {
+        **payload,
+        "email": str(payload.get("email", "")).strip().lower(),
+        "phone": re.sub(r"\D", "", str(payload.get("phone", ""))),
+    }
+    canonical = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def idempotency_key(scope: str, header_key: Optional[str], payload: dict) -> str:
+    """Chave da submissão: header do cliente ou hash de email + telefone + payload"""
+    if header_key:
+        return f"{scope}:key:{header_key.strip()[:255]}"
+    return f"{scope}:hash:{payload_fingerprint(payload)}"
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "future", "expires_at")
+
+    def __init__(self, fingerprint: str, future: asyncio.Future, expires_at: float):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.expires_at = expires_at
+
+
+class IdempotencyStore:
+    """LRU com TTL das respostas recentes, por chave de idempotência"""
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+        self.replays = 0
+        self.misses = 0
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.future.done() and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            # Nunca descartar uma submissão ainda em andamento
+            key, entry = next(iter(self._entries.items()))
+            if not entry.future.done():
+                self._entries.move_to_end(key)
+                break
+            del self._entries[key]
+
+    async def run(self, key: str, payload: dict, handler: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Executa handler() uma vez por chave dentro da janela
+        Retorna (resposta, repetida); levanta IdempotencyKeyReused se a chave
+        já foi usada com outro payload
+        """
+        fingerprint = payload_fingerprint(payload)
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReused(key)
+            self.replays += 1
+            log.info("🔁 Submissão repetida em %s, devolvendo resposta original", key.split(":", 1)[0], extra={"idempotency_key": key})
+            return await asyncio.shield(entry.future), True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = _Entry(fingerprint, future, float("inf"))
+        try:
+            result = await handler()
+        except BaseException as e:
+            del self._entries[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # marcado como recuperado mesmo sem ninguém esperando
+            raise
+        future.set_result(result)
+        self._entries[key].expires_at = time.monotonic() + self.ttl
+        self._evict()
+        return result, False
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "replays": self.replays,
+            "misses": self.misses,
+        }
@@ -0,0 +1,138 @@
+"""
+Operações em lote sobre leads (atualizar / deletar vários de uma vez)
+
+Uma lista de IDs ou uma expressão de filtro vira uma única requisição:
+- Supabase: `id=in.(...)` ou `or=(campo.in.(...),...)` com
+  return=representation, para saber exatamente quais leads foram afetados
+- MongoDB: um `bulk_write` com uma operação por lead encontrado
+
+Os filtros combinam campos com OU, como a limpeza de leads demo:
+{"name": [...], "email": [...], "source": [...]}
+"""
+from typing import Dict, List, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+from supabase_client import SupabaseClient, in_filter
+
+# Campos aceitos em expressões de filtro
+LEAD_FILTER_FIELDS = ("name", "email", "phone", "source", "status")
+
+# IDs por requisição (limite prático de tamanho da URL)
+BULK_CHUNK_SIZE = 200
+
+
+def validate_filters(filters: Optional[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """
+    Rejeita (ValueError) campos desconhecidos e valores que não sejam lista
+    não vazia de strings: um valor escalar viraria `in.(...)`/`$in` sobre os
+    caracteres da string, e uma lista vazia não filtraria nada
+    Vale para os dois caminhos (Supabase e MongoDB), que recebem o resultado
+    """
+    filters = filters or {}
+    unknown = [field for field in filters if field not in LEAD_FILTER_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos de filtro não suportados: {', '.join(unknown)}")
+    invalid = [
+        field for field, values in filters.items()
+        if not isinstance(values, list) or not values or not all(isinstance(value, str) for value in values)
+    ]
+    if invalid:
+        raise ValueError(f"Filtros devem ser listas não vazias de strings: {', '.join(invalid)}")
+    return dict(filters)
+
+
+def supabase_filter_params(filters: Dict[str, List[str]]) -> dict:
+    conditions = ",".join(f"{field}.{in_filter(values)}" for field, values in filters.items())
+    return {"or": f"({conditions})"}
+
+
+def mongo_filter(filters: Dict[str, List[str]]) -> dict:
+    return {"$or": [{field: {"$in": values}} for field, values in filters.items()]}
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _results_for_ids(ids: List[str], affected: List[dict], status: str) -> List[dict]:
+    """Resultado por ID pedido: status da operação ou not_found"""
+    affected_ids = {str(lead.get("id")) for lead in affected}
+    return [
+        {"id": lead_id, "status": status if str(lead_id) in affected_ids else "not_found"}
+        for lead_id in ids
+    ]
+
+
+def _results_for_leads(affected: List[dict], status: str) -> List[dict]:
+    return [
+        {"id": lead.get("id"), "status": status, "name": lead.get("name"), "email": lead.get("email")}
+        for lead in affected
+    ]
+
+
+async def _supabase_bulk(supabase: SupabaseClient, method: str, params_list: List[dict], update_data: Optional[dict]):
+    affected = []
+    for params in params_list:
+        response = await supabase.request(
+            method,
+            "leads",
+            params={**params, "select": "id,name,email"},
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=representation"
+            },
+            json=update_data
+        )
+        if response.status_code != 200:
+            raise Exception(f"Supabase respondeu {response.status_code} - {response.text}")
+        affected.extend(response.json())
+    return affected
+
+
+async def bulk_update_supabase(supabase: SupabaseClient, ids: List[str], filters: Dict[str, List[str]], update_data: dict) -> List[dict]:
+    if ids:
+        params_list = [{"id": in_filter(chunk)} for chunk in _chunks(ids, BULK_CHUNK_SIZE)]
+        affected = await _supabase_bulk(supabase, "PATCH", params_list, update_data)
+        return _results_for_ids(ids, affected, "updated")
+    affected = await _supabase_bulk(supabase, "PATCH", [supabase_filter_params(filters)], update_data)
+    return _results_for_leads(affected, "updated")
+
+
+async def bulk_delete_supabase(supabase: SupabaseClient, ids: List[str], filters: Dict[str, List[str]]) -> List[dict]:
+    if ids:
+        params_list = [{"id": in_filter(chunk)} for chunk in _chunks(ids, BULK_CHUNK_SIZE)]
+        affected = await _supabase_bulk(supabase, "DELETE", params_list, None)
+        return _results_for_ids(ids, affected, "deleted")
+    affected = await _supabase_bulk(supabase, "DELETE", [supabase_filter_params(filters)], None)
+    return _results_for_leads(affected, "deleted")
+
+
+async def _mongo_targets(collection, ids: List[str], filters: Dict[str, List[str]]) -> List[dict]:
+    query = {"id": {"$in": ids}} if ids else mongo_filter(filters)
+    return await collection.find(query, {"_id": 0, "id": 1, "name": 1, "email": 1}).to_list(length=None)
+
+
+async def bulk_update_mongo(collection, ids: List[str], filters: Dict[str, List[str]], update_data: dict) -> List[dict]:
+    targets = await _mongo_targets(collection, ids, filters)
+    if targets:
+        await collection.bulk_write(
+            [UpdateOne({"id": lead["id"]}, {"$set": update_data}) for lead in targets],
+            ordered=False
+        )
+    if ids:
+        return _results_for_ids(ids, targets, "updated")
+    return _results_for_leads(targets, "updated")
+
+
+async def bulk_delete_mongo(collection, ids: List[str], filters: Dict[str, List[str]]) -> List[dict]:
+    targets = await _mongo_targets(collection, ids, filters)
+    if targets:
+        await collection.bulk_write(
+            [DeleteOne({"id": lead["id"]}) for lead in targets],
+            ordered=False
+        )
+    if ids:
+        return _results_for_ids(ids, targets, "deleted")
+    return _results_for_leads(targets, "deleted")
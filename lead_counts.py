@@ -0,0 +1,80 @@
+"""
+Totais de leads para a paginação do fallback MongoDB
+
+count_documents() a cada página percorre todos os leads do filtro. Aqui:
+- sem filtro: estimated_document_count() (metadado da coleção, O(1))
+- por status: contagens de todos os status carregadas de uma vez (um
+  $group sobre o índice status_created_at) e mantidas em memória; as
+  escritas do server.py ajustam os totais (record_*)
+
+Escritas que não informam o status afetado (bulk) chamam invalidate(). Como
+outra instância pode escrever na mesma coleção, as contagens são
+recarregadas a cada `resync_seconds` de qualquer forma.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+
+class LeadCountCache:
+    def __init__(self, resync_seconds: float = 300.0):
+        self.resync_seconds = resync_seconds
+        self._counts: Optional[Dict[str, int]] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+        self.hits = 0
+        self.loads = 0
+
+    async def count(self, collection, status: Optional[str] = None) -> int:
+        """Total de leads (com o status, se informado)"""
+        if status is None:
+            return await collection.estimated_document_count()
+        counts = await self._current(collection)
+        return counts.get(status, 0)
+
+    def _fresh(self) -> bool:
+        return self._counts is not None and time.monotonic() - self._loaded_at < self.resync_seconds
+
+    async def _current(self, collection) -> Dict[str, int]:
+        if self._fresh():
+            self.hits += 1
+            return self._counts
+        async with self._lock:
+            if not self._fresh():
+                rows = await collection.aggregate([
+                    {"$sort": {"status": 1}},
+                    {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+                ]).to_list(length=None)
+                self._counts = {row["_id"]: row["count"] for row in rows}
+                self._loaded_at = time.monotonic()
+                self.loads += 1
+            return self._counts
+
+    # ---- ajustes a partir das escritas ----
+
+    def record_insert(self, status: str, count: int = 1):
+        if self._counts is not None and count:
+            self._counts[status] = self._counts.get(status, 0) + count
+
+    def record_delete(self, status: str, count: int = 1):
+        if self._counts is not None and count:
+            self._counts[status] = max(0, self._counts.get(status, 0) - count)
+
+    def record_status_change(self, old: Optional[str], new: Optional[str]):
+        if old != new:
+            self.record_delete(old)
+            self.record_insert(new)
+
+    def invalidate(self):
+        """Descarta as contagens; a próxima consulta por status recarrega"""
+        self._counts = None
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._counts is not None,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._counts is not None else None,
+            "statuses": len(self._counts or {}),
+            "hits": self.hits,
+            "loads": self.loads,
+        }
@@ -0,0 +1,149 @@
+"""
+Exportação de leads em streaming (CSV ou NDJSON)
+
+Percorre todos os leads do filtro em páginas, sem OFFSET e sem contagem:
+- Supabase: paginação keyset em (created_at, id), a mesma do /api/leads
+- MongoDB: um cursor com batch_size
+
+Só uma página fica em memória por vez; cada página vira um pedaço da
+resposta assim que chega.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from fast_json import dumps
+from pagination import keyset_filter
+from structured_logging import get_logger
+from supabase_client import quote_value
+
+log = get_logger("lead_export")
+
+EXPORT_COLUMNS = [
+    "id", "created_at", "name", "email", "phone", "message", "status",
+    "source", "language", "sms_consent", "notes", "assigned_to",
+]
+
+# Início de célula que planilhas (Excel, Sheets) interpretam como fórmula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _date_filter(created_from: Optional[datetime], created_to: Optional[datetime]) -> List[str]:
+    conditions = []
+    if created_from:
+        conditions.append(f"created_at.gte.{quote_value(created_from.isoformat())}")
+    if created_to:
+        conditions.append(f"created_at.lt.{quote_value(created_to.isoformat())}")
+    return conditions
+
+
+async def supabase_lead_pages(
+    supabase,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    page_size: int = 500,
+) -> AsyncIterator[List[dict]]:
+    """Páginas de leads do Supabase, do mais novo ao mais antigo; levanta exceção se uma página falhar"""
+    base_params = {"select": "*", "order": "created_at.desc,id.desc", "limit": str(page_size)}
+    if status:
+        base_params["status"] = f"eq.{status}"
+    dates = _date_filter(created_from, created_to)
+    if dates:
+        base_params["and"] = f"({','.join(dates)})"
+
+    cursor = None
+    while True:
+        params = dict(base_params)
+        if cursor:
+            params["or"] = keyset_filter(cursor)
+        response = await supabase.get("leads", timeout=30, params=params)
+        if response.status_code != 200:
+            raise Exception(f"Supabase respondeu {response.status_code} - {response.text}")
+
+        page = response.json()
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = {"created_at": page[-1]["created_at"], "id": str(page[-1]["id"])}
+
+
+async def mongo_lead_pages(
+    collection,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    page_size: int = 500,
+) -> AsyncIterator[List[dict]]:
+    """Páginas de leads do MongoDB (coleção contacts), lidas de um único cursor"""
+    query = {}
+    if status:
+        query["status"] = status
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+
+    cursor = collection.find(query, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).batch_size(page_size)
+    page = []
+    async for lead in cursor:
+        page.append(lead)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Campos vêm do formulário público: "=HYPERLINK(...)" não pode virar fórmula
+        return "'" + value
+    return value
+
+
+def csv_chunk(leads: List[dict], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for lead in leads:
+        writer.writerow([_cell(lead.get(column)) for column in EXPORT_COLUMNS])
+    return buffer.getvalue().encode()
+
+
+def ndjson_chunk(leads: List[dict]) -> bytes:
+    return b"".join(dumps(lead) + b"\n" for lead in leads)
+
+
+async def export_chunks(first_page: List[dict], pages: AsyncIterator[List[dict]], export_format: str) -> AsyncIterator[bytes]:
+    """
+    Corpo da resposta, um pedaço por página
+    A primeira página já vem lida (erros antes do início do stream viram 500)
+    """
+    if export_format == "csv":
+        yield csv_chunk(first_page, header=True)
+    else:
+        yield ndjson_chunk(first_page)
+
+    try:
+        async for page in pages:
+            yield csv_chunk(page) if export_format == "csv" else ndjson_chunk(page)
+    except Exception as e:
+        # Status 200 já foi enviado: o NDJSON termina com uma linha de erro, o CSV só é truncado
+        log.error("❌ Exportação de leads interrompida: %s", e)
+        if export_format == "ndjson":
+            yield dumps({"error": str(e)}) + b"\n"
@@ -0,0 +1,282 @@
+"""
+Notificações de novos leads, fora do caminho do request
+
+POST /api/contact só coloca o lead numa fila asyncio limitada (notify() não
+espera nada). Workers em background:
+- agrupam os leads que chegam juntos (até `batch_size`, esperando no máximo
+  `batch_window` segundos): uma rajada vira uma única mensagem-resumo
+- entregam o lote em cada sink configurado (webhook, n8n, SMTP), com novas
+  tentativas e backoff; a falha de um sink não afeta os outros
+
+Com a fila cheia o lead não é notificado (o lead em si já foi salvo): o
+descarte é contado em stats(), junto com a profundidade e o pico da fila.
+"""
+import asyncio
+import random
+import smtplib
+import time
+from email.message import EmailMessage
+from typing import List, Optional
+
+import httpx
+
+from structured_logging import get_logger
+
+log = get_logger("lead_notifications")
+
+
+def lead_summary(lead: dict) -> str:
+    return f"{lead.get('name')} <{lead.get('email')}> {lead.get('phone')} (fonte: {lead.get('source')})"
+
+
+def format_digest(leads: List[dict]):
+    """Assunto e corpo em texto de uma notificação (um lead ou resumo de vários)"""
+    if len(leads) == 1:
+        lead = leads[0]
+        subject = f"Novo lead: {lead.get('name')}"
+    else:
+        subject = f"{len(leads)} novos leads"
+    lines = []
+    for lead in leads:
+        lines.append(f"- {lead_summary(lead)}")
+        if lead.get("message"):
+            lines.append(f"  {lead['message']}")
+    return subject, "\n".join(lines)
+
+
+class WebhookSink:
+    """POST JSON com os leads do lote para uma URL"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def payload(self, leads: List[dict]) -> dict:
+        return {
+            "event": "lead.created" if len(leads) == 1 else "lead.digest",
+            "count": len(leads),
+            "leads": leads,
+        }
+
+    async def send(self, leads: List[dict]):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.post(self.url, json=self.payload(leads))
+        response.raise_for_status()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class N8nSink(WebhookSink):
+    """Webhook do n8n: mesmo JSON, com o resumo pronto para mensagens (WhatsApp/SMS)"""
+
+    name = "n8n"
+
+    def payload(self, leads: List[dict]) -> dict:
+        subject, text = format_digest(leads)
+        return {**super().payload(leads), "subject": subject, "text": text}
+
+
+class SmtpSink:
+    """Email (smtplib numa thread, para não bloquear o event loop)"""
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int, sender: str, recipients: List[str],
+                 username: str = "", password: str = "", starttls: bool = True, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def _send(self, message: EmailMessage):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+    async def send(self, leads: List[dict]):
+        subject, text = format_digest(leads)
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content(text)
+        await asyncio.to_thread(self._send, message)
+
+    async def close(self):
+        pass
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        sinks: list,
+        max_queue: int = 1000,
+        batch_size: int = 20,
+        batch_window: float = 5.0,
+        workers: int = 1,
+        retries: int = 3,
+        base_backoff: float = 1.0,
+    ):
+        self.sinks = sinks
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.workers = workers
+        self.retries = retries
+        self.base_backoff = base_backoff
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.peak_depth = 0
+        self.batches = 0
+        self.delivered = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.sink_failures = {sink.name: 0 for sink in sinks}
+
+    @classmethod
+    def from_settings(cls, settings) -> "NotificationDispatcher":
+        """Sinks com URL/host configurado; sem nenhum, o dispatcher fica desligado"""
+        sinks = []
+        if settings.notify_webhook_url:
+            sinks.append(WebhookSink(settings.notify_webhook_url))
+        if settings.notify_n8n_webhook_url:
+            sinks.append(N8nSink(settings.notify_n8n_webhook_url))
+        if settings.notify_smtp_host and settings.notify_smtp_to:
+            sinks.append(SmtpSink(
+                settings.notify_smtp_host,
+                settings.notify_smtp_port,
+                sender=settings.notify_smtp_from or settings.notify_smtp_username,
+                recipients=[address.strip() for address in settings.notify_smtp_to.split(",") if address.strip()],
+                username=settings.notify_smtp_username,
+                password=settings.notify_smtp_password,
+                starttls=settings.notify_smtp_starttls,
+            ))
+        return cls(
+            sinks,
+            max_queue=settings.notify_queue_size,
+            batch_size=settings.notify_batch_size,
+            batch_window=settings.notify_batch_window,
+            workers=settings.notify_workers,
+            retries=settings.notify_retries,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def notify(self, lead: dict) -> bool:
+        """Enfileira sem esperar; False se a fila estiver cheia (ou sem sinks)"""
+        if not self.enabled or self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(lead)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning("⚠️ Fila de notificações cheia (%s), lead %s não será notificado", self.max_queue, lead.get("id"))
+            return False
+        self.enqueued += 1
+        self.peak_depth = max(self.peak_depth, self._queue.qsize())
+        return True
+
+    # ---- workers ----
+
+    def start(self):
+        if not self.enabled or self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def _next_batch(self) -> List[dict]:
+        """Espera o primeiro lead e junta os que chegarem na janela"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                log.exception("❌ Erro no worker de notificações: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch: List[dict]):
+        self.batches += 1
+        results = await asyncio.gather(*(self._send_with_retry(sink, batch) for sink in self.sinks))
+        if all(results):
+            self.delivered += len(batch)
+        else:
+            self.failed += len(batch)
+
+    async def _send_with_retry(self, sink, batch: List[dict]) -> bool:
+        for attempt in range(self.retries + 1):
+            try:
+                await sink.send(batch)
+                log.info("🔔 %s leads notificados via %s", len(batch), sink.name, extra={"sink": sink.name})
+                return True
+            except Exception as e:
+                self.last_error = f"{sink.name}: {str(e)[:200]}"
+                if attempt == self.retries:
+                    self.sink_failures[sink.name] += 1
+                    log.error("❌ Notificação via %s falhou após %s tentativas: %s", sink.name, attempt + 1, e)
+                    return False
+                await asyncio.sleep(self.base_backoff * (2 ** attempt) * random.uniform(0.8, 1.2))
+
+    async def close(self, timeout: float = 10.0):
+        """Tenta entregar o que está na fila (até `timeout`) e para os workers"""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                log.warning("⚠️ %s notificações não entregues no shutdown", self._queue.qsize())
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        for sink in self.sinks:
+            await sink.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sinks": [sink.name for sink in self.sinks],
+            "depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "peak_depth": self.peak_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "sink_failures": self.sink_failures,
+            "last_error": self.last_error,
+        }
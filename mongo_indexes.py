@@ -0,0 +1,99 @@
+"""
+Índices do MongoDB (fallback) e checagem dos planos de consulta
+
+ensure_indexes() cria, no startup, os índices que as consultas do
+server.py usam: `id` único (update_one/delete_one por id), status +
+created_at (listagem de leads com filtro, ordenada do mais novo) e email.
+create_index é idempotente, então rodar a cada start não custa nada.
+
+check_query_plans() roda explain (só queryPlanner, não executa a consulta)
+nas consultas principais e avisa quando alguma faria COLLSCAN.
+"""
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from structured_logging import get_logger
+
+log = get_logger("mongo_indexes")
+
+# Ordem da listagem de leads (get_leads / paginação keyset)
+NEWEST_FIRST = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "contacts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), *NEWEST_FIRST], name="status_created_at"),
+        IndexModel(NEWEST_FIRST, name="created_at"),
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    "bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    # Reviews enviados pelo site não têm status nem email: aprovação faz o papel de status
+    "reviews": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("approved", ASCENDING), ("created_at", DESCENDING)], name="approved_created_at"),
+    ],
+}
+
+# (coleção, descrição, comando find/count) - valores de exemplo, só o formato importa
+QUERY_CHECKS = [
+    ("contacts", "leads por status", {"find": "contacts", "filter": {"status": "new"}, "sort": dict(NEWEST_FIRST), "limit": 50}),
+    ("contacts", "leads sem filtro", {"find": "contacts", "filter": {}, "sort": dict(NEWEST_FIRST), "limit": 50}),
+    ("contacts", "total por status", {"count": "contacts", "query": {"status": "new"}}),
+    ("contacts", "lead por id", {"find": "contacts", "filter": {"id": "00000000-0000-0000-0000-000000000000"}, "limit": 1}),
+    ("contacts", "leads por email", {"find": "contacts", "filter": {"email": "check@example.com"}}),
+    ("bookings", "booking por id", {"find": "bookings", "filter": {"id": "00000000-0000-0000-0000-000000000000"}, "limit": 1}),
+    ("reviews", "review por id", {"find": "reviews", "filter": {"id": "00000000-0000-0000-0000-000000000000"}, "limit": 1}),
+]
+
+
+async def ensure_indexes(db, indexes: Dict[str, List[IndexModel]] = INDEXES) -> Dict[str, List[str]]:
+    """
+    Cria os índices que faltam; retorna {coleção: [nomes]}
+    Um índice recusado pelo servidor (ex.: `id` duplicado impedindo o único)
+    só gera aviso. Erro de conexão levanta na hora: tentar índice por índice
+    só somaria um timeout de seleção de servidor por índice
+    """
+    created = {}
+    for collection, models in indexes.items():
+        try:
+            created[collection] = await db[collection].create_indexes(models)
+        except OperationFailure:
+            # Tenta um por um para não perder os demais índices da coleção
+            created[collection] = []
+            for model in models:
+                try:
+                    created[collection] += await db[collection].create_indexes([model])
+                except OperationFailure as index_error:
+                    log.warning("⚠️ Índice %s.%s não criado: %s", collection, model.document["name"], index_error)
+    log.info("🗂️ Índices do MongoDB verificados: %s", ", ".join(f"{name} ({len(names)})" for name, names in created.items()))
+    return created
+
+
+def plan_stages(plan: dict) -> List[str]:
+    """Estágios de um plano do explain, da raiz para as folhas"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+async def check_query_plans(db, checks=QUERY_CHECKS) -> List[dict]:
+    """Explain das consultas principais; avisa quando o plano vencedor é COLLSCAN"""
+    report = []
+    for collection, description, command in checks:
+        result = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        stages = plan_stages(result["queryPlanner"]["winningPlan"])
+        collscan = "COLLSCAN" in stages
+        if collscan:
+            log.warning("⚠️ Consulta '%s' em %s faz collection scan (plano: %s)", description, collection, " <- ".join(stages))
+        report.append({"collection": collection, "query": description, "stages": stages, "collscan": collscan})
+    return report
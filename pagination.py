@@ -0,0 +1,66 @@
+"""
+Paginação por cursor (keyset) em (created_at, id)
+
+O cursor é opaco para o cliente: base64 de {"created_at", "id"} do último
+item da página. A próxima página continua de onde parou sem OFFSET, então
+páginas profundas custam o mesmo que a primeira.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from supabase_client import quote_value
+
+
+def encode_cursor(created_at, item_id) -> str:
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps({"created_at": created_at, "id": str(item_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decodifica o cursor; levanta ValueError se for inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not data.get("created_at") or not data.get("id"):
+            raise ValueError("cursor incompleto")
+        return data
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
+
+def next_cursor(items: list, limit: int) -> Optional[str]:
+    """Cursor para a página seguinte, ou None se esta é a última"""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(last.get("created_at"), last.get("id"))
+
+
+def keyset_filter(cursor: dict) -> str:
+    """Filtro PostgREST `or=(...)` para itens depois do cursor em created_at.desc,id.desc"""
+    created_at = quote_value(cursor["created_at"])
+    item_id = quote_value(cursor["id"])
+    return f"(created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{item_id}))"
+
+
+def keyset_mongo_filter(cursor: dict) -> dict:
+    """Mesmo filtro do keyset_filter para o fallback MongoDB"""
+    created_at = datetime.fromisoformat(cursor["created_at"])
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": cursor["id"]}}
+        ]
+    }
+
+
+def parse_content_range(content_range: str) -> Optional[int]:
+    """Total do header Content-Range do PostgREST ("0-49/123"), ou None se desconhecido"""
+    if "/" not in (content_range or ""):
+        return None
+    total = content_range.split("/")[-1]
+    return int(total) if total.isdigit() else None
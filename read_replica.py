@@ -0,0 +1,191 @@
+"""
+Réplica local (SQLite, WAL) dos dados públicos: google_reviews e service_types
+
+O review_sync e o catálogo de serviços gravam aqui cada snapshot que
+carregam do Supabase/MongoDB. No startup, os dois são recarregados a partir
+do arquivo antes de qualquer consulta remota: /api/reviews,
+/api/reviews/stats e /api/services respondem mesmo que o processo reinicie
+com o Supabase e o MongoDB fora do ar.
+
+As leituras durante o request continuam vindo dos snapshots em memória (já
+codificados); o arquivo é a cópia durável deles. google_reviews guarda
+todas as linhas ativas, uma por row_key (como os stats as contam); a
+deduplicação por conteúdo de /api/reviews acontece na leitura. Índices:
+- review_time: ordem de /api/reviews e watermark do delta
+- rating: consultas por nota (distribuição de estrelas)
+- content_hash: busca das duplicatas por conteúdo
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from fast_json import dumps
+from review_dedup import row_content_hash, row_key
+
+# Versão do esquema (PRAGMA user_version): a réplica é só uma cópia, então um
+# arquivo de outra versão é recriado vazio e preenchido no próximo sync
+SCHEMA_VERSION = 2
+
+REVIEW_FIELDS = (
+    "row_key", "id", "review_id", "content_hash", "author_name", "rating", "text",
+    "relative_time_description", "profile_photo_url", "review_time",
+)
+
+
+class ReadReplica:
+    def __init__(self, path: str):
+        self.path = path
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # Contadores em memória para stats(): /api/health não toca no arquivo
+        self.reviews = 0
+        self.services = 0
+        self.reviews_synced_at: Optional[float] = None
+        self.writes = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for table in ("google_reviews", "service_types", "replica_meta"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS google_reviews (
+                    row_key TEXT PRIMARY KEY,
+                    id INTEGER,
+                    review_id TEXT,
+                    content_hash TEXT NOT NULL,
+                    author_name TEXT,
+                    rating INTEGER,
+                    text TEXT,
+                    relative_time_description TEXT,
+                    profile_photo_url TEXT,
+                    review_time TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS google_reviews_content_hash_idx ON google_reviews (content_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS google_reviews_review_time_idx ON google_reviews (review_time)")
+            conn.execute("CREATE INDEX IF NOT EXISTS google_reviews_rating_idx ON google_reviews (rating)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS service_types (
+                    position INTEGER PRIMARY KEY,
+                    payload TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS replica_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _write(self, statements: List[Tuple[str, list]]):
+        """Executa tudo numa transação: quem lê nunca vê o snapshot pela metade"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN")
+                for sql, rows in statements:
+                    conn.executemany(sql, rows)
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                self.write_errors += 1
+                self.last_error = str(e)[:200]
+                raise
+            self.writes += 1
+
+    def _meta(self, key: str, value: str) -> Tuple[str, list]:
+        return "INSERT OR REPLACE INTO replica_meta (key, value) VALUES (?, ?)", [(key, value)]
+
+    # ---- reviews ----
+
+    def _review_values(self, reviews: List[dict]) -> list:
+        return [
+            tuple(self._review_value(review, field) for field in REVIEW_FIELDS)
+            for review in reviews
+        ]
+
+    def _review_value(self, review: dict, field: str):
+        if field == "row_key":
+            return row_key(review)
+        if field == "content_hash":
+            return row_content_hash(review)
+        return review.get(field)
+
+    def _write_reviews(self, statements: List[Tuple[str, list]]):
+        synced_at = time.time()
+        self._write(statements + [self._meta("reviews_synced_at", str(synced_at))])
+        # Roda na thread do to_thread, nunca no event loop
+        self.reviews = self._execute("SELECT COUNT(*) FROM google_reviews")[0][0]
+        self.reviews_synced_at = synced_at
+
+    def replace_reviews(self, reviews: List[dict]):
+        """Troca todos os reviews (releitura completa do Supabase)"""
+        insert = f"INSERT OR REPLACE INTO google_reviews ({','.join(REVIEW_FIELDS)}) VALUES ({','.join('?' * len(REVIEW_FIELDS))})"
+        self._write_reviews([("DELETE FROM google_reviews", [()]), (insert, self._review_values(reviews))])
+
+    def add_reviews(self, reviews: List[dict]):
+        """Acrescenta linhas novas (delta ou webhook); a mesma row_key substitui a anterior"""
+        if not reviews:
+            return
+        insert = f"INSERT OR REPLACE INTO google_reviews ({','.join(REVIEW_FIELDS)}) VALUES ({','.join('?' * len(REVIEW_FIELDS))})"
+        self._write_reviews([(insert, self._review_values(reviews))])
+
+    def load_reviews(self) -> List[dict]:
+        """Reviews do mais recente ao mais antigo (índice em review_time)"""
+        rows = self._execute(f"SELECT {','.join(REVIEW_FIELDS)} FROM google_reviews ORDER BY review_time DESC")
+        synced_at = self._execute("SELECT value FROM replica_meta WHERE key = 'reviews_synced_at'")
+        self.reviews = len(rows)
+        self.reviews_synced_at = float(synced_at[0][0]) if synced_at else None
+        # row_key é só da réplica; o snapshot recebe as linhas como vêm do Supabase
+        return [dict(zip(REVIEW_FIELDS[1:], row[1:])) for row in rows]
+
+    # ---- service_types ----
+
+    def replace_services(self, services: List[dict], version: str):
+        self._write([
+            ("DELETE FROM service_types", [()]),
+            ("INSERT INTO service_types (position, payload) VALUES (?, ?)",
+             [(position, dumps(service).decode()) for position, service in enumerate(services)]),
+            self._meta("services_version", version),
+        ])
+        self.services = len(services)
+
+    def load_services(self) -> Tuple[List[dict], Optional[str]]:
+        """Serviços na ordem gravada e a versão do catálogo"""
+        services = [json.loads(payload) for payload, in self._execute("SELECT payload FROM service_types ORDER BY position")]
+        version = self._execute("SELECT value FROM replica_meta WHERE key = 'services_version'")
+        self.services = len(services)
+        return services, version[0][0] if version else None
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "reviews": self.reviews,
+            "services": self.services,
+            "reviews_age_seconds": round(time.time() - self.reviews_synced_at, 1) if self.reviews_synced_at else None,
+            "writes": self.writes,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,170 @@
+"""
+Métricas de latência por rota e chamadas ao Supabase/MongoDB
+
+- MetricsMiddleware (ASGI) mede a duração de cada request por rota e
+  adiciona o header Server-Timing com o tempo gasto em cada backend
+- record_upstream() é chamado pelo SupabaseClient e pelo listener de
+  comandos do MongoDB; o tempo entra no histograma do backend e no total
+  do request atual (ContextVar)
+- render_prometheus() gera o texto servido em /metrics
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tempo e número de chamadas por backend do request em andamento
+_request_upstream: ContextVar[Optional[Dict[str, list]]] = ContextVar("request_upstream", default=None)
+
+# O listener do MongoDB roda nas threads do Motor
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series: Dict[tuple, list] = {}  # labels -> [contagem por bucket..., soma, total]
+
+    def observe(self, labels: tuple, value: float):
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            base = _labels(self.label_names, labels)
+            for i, bound in enumerate(BUCKETS):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {series[i]}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple, value: float = 1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with _lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{{{_labels(self.label_names, labels)}}} {value:g}")
+        return lines
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Duração dos requests por rota", ("method", "route", "status")
+)
+upstream_duration = Histogram(
+    "upstream_call_duration_seconds", "Duração de cada chamada ao backend", ("backend",)
+)
+request_upstream_seconds = Counter(
+    "http_request_upstream_seconds_total", "Tempo gasto em backends pelos requests de cada rota", ("route", "backend")
+)
+request_upstream_calls = Counter(
+    "http_request_upstream_calls_total", "Chamadas a backends feitas pelos requests de cada rota", ("route", "backend")
+)
+
+
+def record_upstream(backend: str, duration: float):
+    """Registra uma chamada ao backend (duration em segundos)"""
+    upstream_duration.observe((backend,), duration)
+    timings = _request_upstream.get()
+    if timings is not None:
+        with _lock:
+            entry = timings.setdefault(backend, [0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Listener de comandos do PyMongo: toda operação do Motor passa por aqui"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_upstream("mongo", event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        record_upstream("mongo", event.duration_micros / 1_000_000)
+
+
+def _server_timing(app_seconds: float, timings: Dict[str, list]) -> str:
+    parts = [f"app;dur={app_seconds * 1000:.1f}"]
+    for backend, (calls, seconds) in sorted(timings.items()):
+        parts.append(f'{backend};dur={seconds * 1000:.1f};desc="{calls} calls"')
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro (não bufferiza respostas em streaming)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, list] = {}
+        token = _request_upstream.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                with _lock:
+                    header = _server_timing(time.perf_counter() - started, timings)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_upstream.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            request_duration.observe((scope["method"], route_path, str(status)), time.perf_counter() - started)
+            for backend, (calls, seconds) in list(timings.items()):
+                request_upstream_calls.inc((route_path, backend), calls)
+                request_upstream_seconds.inc((route_path, backend), seconds)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in (request_duration, upstream_duration, request_upstream_seconds, request_upstream_calls):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+"""
+Cache em memória com TTL + stale-while-revalidate
+
+- Dentro do TTL: responde direto da memória
+- Entre TTL e TTL + stale_ttl: responde o valor antigo e atualiza em background
+- Frio (ou expirado de vez): espera a atualização
+
+Só uma atualização roda por vez (single-flight): N requests com cache frio
+compartilham a mesma consulta ao Supabase.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from structured_logging import get_logger
+
+log = get_logger("response_cache")
+
+_MISSING = object()
+
+
+class SWRCache:
+    """Cache de um único valor com TTL e stale-while-revalidate"""
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._value: Any = _MISSING
+        self._fetched_at = 0.0
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+
+        # Métricas
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def get(self, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Retorna o valor em cache, chamando `loader` quando necessário"""
+        if self._value is not _MISSING:
+            age = time.monotonic() - self._fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return self._value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(loader)
+                return self._value
+
+        self.misses += 1
+        # shield: se o cliente desconectar, a atualização compartilhada continua
+        return await asyncio.shield(self._refresh(loader))
+
+    def invalidate(self):
+        """Descarta o valor atual; o próximo get() busca dados novos"""
+        self._value = _MISSING
+        self._generation += 1
+        # Uma atualização em andamento pode trazer dados anteriores à invalidação
+        self._task = None
+
+    def _refresh(self, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(loader, self._generation))
+            self._task.add_done_callback(self._on_done)
+        return self._task
+
+    async def _run(self, loader: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        self.refreshes += 1
+        value = await loader()
+        if generation == self._generation:
+            self._value = value
+            self._fetched_at = time.monotonic()
+        return value
+
+    def _on_done(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.refresh_errors += 1
+            log.error("❌ Erro atualizando cache '%s': %s", self.name, error)
+
+    def stats(self) -> dict:
+        cached = self._value is not _MISSING
+        return {
+            "cached": cached,
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if cached else None,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
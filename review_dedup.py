@@ -0,0 +1,149 @@
+"""
+Deduplicação de reviews por hash de conteúdo
+
+Um único ponto define a normalização (autor + rating + texto) e o hash MD5
+gravado em google_reviews.content_hash no momento da ingestão. Verificar
+duplicata passa a ser uma busca por igualdade no índice dessa coluna, em vez
+de varrer reviews do mesmo autor e comparar textos em Python.
+
+scan_duplicates faz a verificação completa da tabela em modo streaming;
+fetch_active_reviews lê todos os reviews ativos com a mesma paginação por id
+(uma leitura sem paginação seria cortada pelo max-rows do PostgREST).
+"""
+import hashlib
+from typing import List, Optional
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normaliza texto para comparação (minúsculas, espaços colapsados)"""
+    return " ".join((text or "").strip().lower().split())
+
+
+def content_hash(author_name: Optional[str], rating, text: Optional[str]) -> str:
+    """Hash MD5 de autor + rating + texto normalizados"""
+    author = (author_name or "").strip().lower()
+    return hashlib.md5(f"{author}_{rating}_{normalize_text(text)}".encode()).hexdigest()
+
+
+def row_content_hash(row: dict) -> str:
+    """Hash gravado na linha, ou calculado para linhas antigas sem a coluna preenchida"""
+    return row.get("content_hash") or content_hash(row.get("author_name"), row.get("rating", 0), row.get("text"))
+
+
+def row_key(row: dict) -> str:
+    """Identidade da linha no banco: review_id (único na tabela) ou, em linhas antigas sem ele, o id"""
+    return row.get("review_id") or f"id:{row.get('id')}"
+
+
+async def fetch_active_reviews(supabase, columns: str, page_size: int = 1000) -> List[dict]:
+    """
+    Todos os reviews ativos, em páginas por id (keyset); `columns` precisa
+    incluir id. Para só na página vazia: com max-rows menor que page_size,
+    páginas cheias voltam com menos linhas. Levanta exceção em caso de erro
+    """
+    rows = []
+    last_id = None
+    while True:
+        params = {"select": columns, "is_active": "eq.true", "order": "id.asc", "limit": str(page_size)}
+        if last_id is not None:
+            params["id"] = f"gt.{last_id}"
+
+        response = await supabase.get("google_reviews", timeout=30, params=params)
+        if response.status_code != 200:
+            raise Exception(f"Supabase respondeu {response.status_code}")
+
+        page = response.json()
+        if not page:
+            return rows
+        rows.extend(page)
+        last_id = page[-1]["id"]
+
+
+async def scan_duplicates(supabase, page_size: int = 500):
+    """
+    Varre google_reviews com paginação por id (keyset) e gera eventos conforme
+    encontra duplicatas. Guarda apenas digests de 16 bytes -> id da primeira
+    ocorrência, então a memória não depende do tamanho do texto dos reviews.
+
+    Gera dicts com "type": "duplicate_by_review_id", "duplicate_by_content",
+    "error" ou, ao final, "summary".
+    """
+    first_by_review_id = {}
+    first_by_content = {}
+    total_reviews = 0
+    duplicates_by_id = 0
+    duplicates_by_content = 0
+    last_id = None
+
+    while True:
+        params = {
+            "select": "id,review_id,author_name,text,rating,review_time,content_hash",
+            "is_active": "eq.true",
+            "order": "id.asc",
+            "limit": str(page_size)
+        }
+        if last_id is not None:
+            params["id"] = f"gt.{last_id}"
+
+        response = await supabase.get("google_reviews", timeout=30, params=params)
+        if response.status_code != 200:
+            yield {"type": "error", "error": f"Erro ao buscar reviews: {response.status_code}", "details": response.text}
+            return
+
+        page = response.json()
+        if not page:
+            break
+
+        for review in page:
+            total_reviews += 1
+            text = review.get("text") or ""
+            text_preview = text[:100] + "..." if len(text) > 100 else text
+            current = {
+                "id": review["id"],
+                "review_id": review.get("review_id"),
+                "review_time": review.get("review_time")
+            }
+
+            review_id = review.get("review_id")
+            if review_id:
+                id_digest = hashlib.md5(review_id.encode()).digest()
+                if id_digest in first_by_review_id:
+                    duplicates_by_id += 1
+                    yield {
+                        "type": "duplicate_by_review_id",
+                        "review_id": review_id,
+                        "author": review.get("author_name"),
+                        "rating": review.get("rating"),
+                        "text_preview": text_preview,
+                        "duplicate_1": {"id": first_by_review_id[id_digest]},
+                        "duplicate_2": current
+                    }
+                else:
+                    first_by_review_id[id_digest] = review["id"]
+
+            content_digest = bytes.fromhex(row_content_hash(review))
+            if content_digest in first_by_content:
+                duplicates_by_content += 1
+                yield {
+                    "type": "duplicate_by_content",
+                    "author": review.get("author_name"),
+                    "rating": review.get("rating", 0),
+                    "text_preview": text_preview,
+                    "duplicate_1": {"id": first_by_content[content_digest]},
+                    "duplicate_2": current
+                }
+            else:
+                first_by_content[content_digest] = review["id"]
+
+        # Só para na página vazia: o servidor pode devolver menos que page_size (max-rows)
+        last_id = page[-1]["id"]
+
+    yield {
+        "type": "summary",
+        "total_reviews": total_reviews,
+        "unique_by_review_id": len(first_by_review_id),
+        "unique_by_content": len(first_by_content),
+        "duplicates_by_review_id": duplicates_by_id,
+        "duplicates_by_content": duplicates_by_content,
+        "total_duplicate_groups": duplicates_by_id + duplicates_by_content
+    }
@@ -0,0 +1,308 @@
+"""
+Ingestão de reviews do webhook do n8n
+
+Funções compartilhadas (geração de review_id, linha do Supabase com
+content_hash) e três modos de processamento:
+- sequencial: um review por vez (ingest_review)
+- concorrente: ingest_review em paralelo, limitado por semáforo
+- lote: calcula todos os review_id e content_hash de uma vez, resolve
+  os existentes com uma consulta `in.(...)` por lote e insere todos os
+  reviews novos num único POST em massa
+
+Duplicatas são detectadas por review_id ou pelo content_hash indexado
+(ver review_dedup).
+"""
+import asyncio
+import hashlib
+import re
+import time
+from datetime import datetime
+from typing import List
+
+from review_dedup import content_hash, normalize_text
+from structured_logging import SAMPLED, get_logger
+from supabase_client import SupabaseClient, in_filter, quote_value
+
+log = get_logger("review_ingest")
+
+
+def build_review_id(review: dict, fallback_timestamp: str):
+    """
+    Gera ID único e consistente para um review do Google
+    Retorna (review_id, timestamp_seconds)
+    """
+    author_clean = review.get('author_name', 'anonymous').strip().lower()
+    author_clean = re.sub(r'[^a-z0-9_]+', '_', author_clean)  # Normalizar caracteres
+    review_timestamp = review.get('review_time', fallback_timestamp)
+
+    # Converter timestamp para segundos Unix (arredondar para evitar variações)
+    try:
+        dt = datetime.fromisoformat(review_timestamp.replace('Z', '+00:00'))
+        # Arredondar para o minuto mais próximo para evitar duplicatas por segundos
+        timestamp_seconds = int(dt.replace(second=0, microsecond=0).timestamp())
+    except:
+        timestamp_seconds = int(datetime.now().replace(second=0, microsecond=0).timestamp())
+
+    # Usar hash do texto também para garantir unicidade
+    text_hash = hashlib.md5(normalize_text(review.get('text', '')).encode()).hexdigest()[:8]
+    return f"gp_{author_clean}_{timestamp_seconds}_{text_hash}", timestamp_seconds
+
+
+def build_review_row(review: dict, review_id: str, timestamp_seconds: int) -> dict:
+    """Prepara dados para Supabase - compatível com estrutura existente"""
+    row = {
+        "review_id": review_id,
+        "author_name": review.get("author_name", "Cliente Anônimo")[:255],
+        "author_url": review.get("author_url"),
+        "language": review.get("language", "pt")[:10],
+        "profile_photo_url": review.get("profile_photo_url") or f"https://ui-avatars.com/api/?name={review.get('author_name', 'Cliente')}&background=4285F4&color=fff&size=128",
+        "rating": max(1, min(5, review.get("rating", 5))),  # Garantir range 1-5
+        "relative_time_description": review.get("relative_time_description", "Recente")[:100],
+        "text": review.get("text", "")[:5000],
+        "review_time": review.get("review_time"),
+        "review_timestamp": timestamp_seconds,
+        "translated": review.get("translated", False),
+        "original_language": review.get("original_language", review.get("language", "pt"))[:10],
+        "original_text": review.get("text", "")[:5000],
+        "is_active": True,
+        "is_featured": review.get("rating", 5) >= 4,  # 4+ estrelas são featured
+        "response_from_owner": None,
+        "response_time": None,
+        "helpful_count": 0
+    }
+    # Hash calculado sobre os valores gravados, igual ao usado nas leituras
+    row["content_hash"] = content_hash(row["author_name"], row["rating"], row["text"])
+    return row
+
+
+def dedupe_payload(reviews: List[dict], fallback_timestamp: str):
+    """
+    Monta a linha (review_id + content_hash) de cada review, na ordem do payload
+    Duplicatas dentro do próprio payload: o primeiro vence, os demais são pulados
+    Retorna (linhas candidatas, pulados, erros)
+    """
+    candidates = []
+    skipped = 0
+    errors = 0
+    seen_ids = set()
+    seen_content = set()
+    for review in reviews:
+        try:
+            review_id, timestamp_seconds = build_review_id(review, fallback_timestamp)
+            row = build_review_row(review, review_id, timestamp_seconds)
+        except Exception as review_error:
+            errors += 1
+            log.error("❌ Erro processando review individual: %s", review_error)
+            continue
+
+        if row["review_id"] in seen_ids or row["content_hash"] in seen_content:
+            skipped += 1
+            continue
+        seen_ids.add(row["review_id"])
+        seen_content.add(row["content_hash"])
+        candidates.append(row)
+    return candidates, skipped, errors
+
+
+async def ingest_review(supabase: SupabaseClient, review_data: dict):
+    """
+    Processa uma linha pronta (build_review_row): uma única consulta indexada
+    por review_id ou content_hash e, se for nova, a inserção
+    Retorna (status, linha inserida) com status "saved", "skipped" ou "error"
+    Falhas ficam isoladas neste review
+    """
+    try:
+        review_id = review_data["review_id"]
+        check_response = await supabase.get(
+            "google_reviews",
+            timeout=30,
+            params={
+                "select": "id,review_id",
+                "or": f"(review_id.eq.{quote_value(review_id)},and(content_hash.eq.{review_data['content_hash']},is_active.is.true))",
+                "limit": "1"
+            }
+        )
+
+        if check_response.status_code == 200:
+            existing = check_response.json()
+            if existing:
+                reason = "review_id" if existing[0].get("review_id") == review_id else "conteúdo"
+                log.info("⏭️ Review já existe (por %s): %s - ID %s", reason, review_id, existing[0].get("id"), extra=SAMPLED)
+                return "skipped", None
+
+        # Inserir review no Supabase
+        insert_response = await supabase.post(
+            "google_reviews",
+            timeout=30,
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal"
+            },
+            json=review_data
+        )
+
+        if insert_response.status_code in [200, 201]:
+            log.info("✅ Review salvo: %s - %s⭐", review_data["author_name"], review_data["rating"], extra=SAMPLED)
+            return "saved", review_data
+
+        log.error("❌ Erro ao salvar review: %s - %s", insert_response.status_code, insert_response.text)
+        return "error", None
+
+    except Exception as review_error:
+        log.error("❌ Erro processando review individual: %s", review_error)
+        return "error", None
+
+
+async def ingest_reviews_concurrent(
+    supabase: SupabaseClient,
+    reviews: List[dict],
+    fallback_timestamp: str,
+    concurrency: int = 10,
+) -> dict:
+    """
+    Processa os reviews em paralelo (no máximo `concurrency` ao mesmo tempo)
+    Duplicatas do payload são resolvidas antes, na ordem recebida, então o
+    resultado não depende da ordem em que as chamadas terminam
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    candidates, skipped, errors = dedupe_payload(reviews, fallback_timestamp)
+    timings["prepare_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(review_data):
+        async with semaphore:
+            return await ingest_review(supabase, review_data)
+
+    outcomes = await asyncio.gather(*[run(row) for row in candidates])
+    timings["process_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    inserted = [row for status, row in outcomes if status == "saved"]
+    skipped += sum(1 for status, _ in outcomes if status == "skipped")
+    errors += sum(1 for status, _ in outcomes if status == "error")
+
+    return {
+        "saved": len(inserted),
+        "skipped": skipped,
+        "errors": errors,
+        "inserted": inserted,
+        "timings_ms": timings,
+    }
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def _find_existing(supabase: SupabaseClient, rows: List[dict]):
+    """Uma consulta por lote: review_id ou content_hash já gravados"""
+    review_ids = in_filter([row["review_id"] for row in rows])
+    hashes = in_filter([row["content_hash"] for row in rows])
+    response = await supabase.get(
+        "google_reviews",
+        timeout=30,
+        params={
+            "select": "review_id,content_hash,is_active",
+            "or": f"(review_id.{review_ids},and(content_hash.{hashes},is_active.is.true))"
+        }
+    )
+    if response.status_code != 200:
+        log.warning("⚠️ Falha ao verificar reviews existentes: %s", response.status_code)
+        return set(), set()
+    existing = response.json()
+    return (
+        {row.get("review_id") for row in existing},
+        {row.get("content_hash") for row in existing if row.get("is_active")},
+    )
+
+
+async def _insert_rows(supabase: SupabaseClient, rows: List[dict]):
+    """
+    Insere linhas em massa; review_id duplicado (corrida com outro webhook)
+    é ignorado pelo upsert. Retorna (linhas inseridas, linhas ignoradas)
+    """
+    response = await supabase.post(
+        "google_reviews",
+        timeout=30,
+        params={"on_conflict": "review_id", "select": "review_id"},
+        headers={
+            "Content-Type": "application/json",
+            "Prefer": "return=representation,resolution=ignore-duplicates"
+        },
+        json=rows
+    )
+    if response.status_code not in [200, 201]:
+        raise Exception(f"{response.status_code} - {response.text}")
+
+    inserted_ids = {row.get("review_id") for row in (response.json() or [])}
+    inserted = [row for row in rows if row["review_id"] in inserted_ids]
+    return inserted, len(rows) - len(inserted)
+
+
+async def ingest_reviews_batch(
+    supabase: SupabaseClient,
+    reviews: List[dict],
+    fallback_timestamp: str,
+    batch_size: int = 100,
+) -> dict:
+    """
+    Pipeline em lote: prepara -> consulta existentes -> insere novos
+    Retorna contagens (saved/skipped/errors), linhas inseridas e tempo por fase
+    """
+    inserted: List[dict] = []
+    timings = {}
+
+    # 1. Preparar: review_id e content_hash de todos os reviews
+    started = time.perf_counter()
+    candidates, skipped, errors = dedupe_payload(reviews, fallback_timestamp)
+    timings["prepare_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    # 2. Resolver existentes: uma consulta indexada por lote
+    started = time.perf_counter()
+    new_rows = []
+    for chunk in _chunks(candidates, batch_size):
+        try:
+            existing_ids, existing_hashes = await _find_existing(supabase, chunk)
+        except Exception as lookup_error:
+            errors += len(chunk)
+            log.error("❌ Erro consultando reviews existentes: %s", lookup_error)
+            continue
+
+        for row in chunk:
+            if row["review_id"] in existing_ids or row["content_hash"] in existing_hashes:
+                skipped += 1
+            else:
+                new_rows.append(row)
+    timings["lookup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    # 3. Inserir todos os novos num único POST
+    started = time.perf_counter()
+    if new_rows:
+        try:
+            rows, ignored = await _insert_rows(supabase, new_rows)
+            inserted.extend(rows)
+            skipped += ignored
+        except Exception as insert_error:
+            # Lote rejeitado: inserir um a um para isolar o review com problema
+            log.warning("⚠️ Inserção em massa falhou (%s), tentando individualmente", insert_error)
+            for row in new_rows:
+                try:
+                    rows, ignored = await _insert_rows(supabase, [row])
+                    inserted.extend(rows)
+                    skipped += ignored
+                except Exception as review_error:
+                    errors += 1
+                    log.error("❌ Erro ao salvar review: %s", review_error)
+    timings["insert_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    return {
+        "saved": len(inserted),
+        "skipped": skipped,
+        "errors": errors,
+        "inserted": inserted,
+        "timings_ms": timings,
+    }
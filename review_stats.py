@@ -0,0 +1,98 @@
+"""
+Agregados incrementais de reviews para /api/reviews/stats
+
+Mantém contagem, soma das notas, histograma de estrelas e o review mais
+recente. O banco só é lido por completo no cold start ou numa reconciliação
+explícita; depois disso cada review novo do webhook atualiza os contadores
+e uma consulta de stats custa O(1).
+"""
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+RATING_KEYS = ("5", "4", "3", "2", "1")
+
+
+class ReviewStatsEngine:
+    """Contadores de reviews ativos mantidos em memória"""
+
+    def __init__(self):
+        self.loaded = False
+        self.updated_at: Optional[str] = None  # última mudança nos agregados
+        self._lock = asyncio.Lock()
+        self._rebuilding = False
+        self._pending: List[tuple] = []
+        self._reset()
+
+    def _reset(self):
+        self.total_reviews = 0
+        self.rated_count = 0
+        self.rating_sum = 0
+        self.distribution = {key: 0 for key in RATING_KEYS}
+        self.latest_review_time = ""
+
+    def _apply(self, rating, review_time):
+        self.total_reviews += 1
+        if rating:
+            self.rated_count += 1
+            self.rating_sum += rating
+            key = str(rating)
+            if key in self.distribution:
+                self.distribution[key] += 1
+        if review_time and review_time > self.latest_review_time:
+            self.latest_review_time = review_time
+
+    def add(self, rating: int, review_time: Optional[str] = None, review_id: Optional[str] = None):
+        """Registra um review recém-inserido"""
+        if self._rebuilding:
+            # Pode ou não estar no resultado da reconstrução em andamento
+            self._pending.append((rating, review_time, review_id))
+            return
+        if self.loaded:
+            self._apply(rating, review_time)
+            self.updated_at = datetime.utcnow().isoformat()
+
+    async def ensure_loaded(self, loader: Callable[[], Awaitable[Iterable[dict]]]):
+        """Reconstrói a partir do banco apenas se ainda não carregado"""
+        if not self.loaded:
+            await self.rebuild(loader, force=False)
+
+    async def rebuild(self, loader: Callable[[], Awaitable[Iterable[dict]]], force: bool = True):
+        """
+        Recalcula tudo a partir das linhas retornadas por `loader`
+        (cada linha com rating, review_time e review_id)
+        """
+        async with self._lock:
+            if self.loaded and not force:
+                return
+            self._rebuilding = True
+            self._pending = []
+            try:
+                rows = await loader()
+                self._reset()
+                seen_ids = set()
+                for row in rows:
+                    self._apply(row.get("rating"), row.get("review_time"))
+                    if row.get("review_id"):
+                        seen_ids.add(row["review_id"])
+
+                # Reviews inseridos durante a leitura que não vieram no resultado
+                for rating, review_time, review_id in self._pending:
+                    if not review_id or review_id not in seen_ids:
+                        self._apply(rating, review_time)
+                self.loaded = True
+                self.updated_at = datetime.utcnow().isoformat()
+            finally:
+                self._rebuilding = False
+                self._pending = []
+
+    def snapshot(self) -> Optional[dict]:
+        """Stats no formato de /api/reviews/stats (None se não há notas)"""
+        if not self.rated_count:
+            return None
+        return {
+            "average_rating": round(self.rating_sum / self.rated_count, 1),
+            "total_reviews": self.total_reviews,
+            "rating_distribution": dict(self.distribution),
+            "latest_review_time": self.latest_review_time,
+        }
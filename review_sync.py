@@ -0,0 +1,338 @@
+"""
+Snapshot local de google_reviews para /api/reviews e /api/reviews/stats
+
+Uma task em background mantém em memória os reviews ativos, o JSON de
+/api/reviews já codificado (RenderedJSON), deduplicado por review_id e
+content_hash como em load_reviews_payload, e os agregados de
+/api/reviews/stats (ReviewStatsEngine), que contam todas as linhas ativas
+como load_review_stats_rows. Os endpoints só leem o snapshot: a carga no
+Supabase não depende do tráfego.
+
+- a cada `interval` segundos: uma consulta delta, só dos reviews com
+  review_time >= watermark (o maior review_time já visto)
+- a cada `full_interval` segundos: releitura completa, paginada por id, que
+  pega o que o delta não enxerga (reviews desativados ou removidos,
+  review_time antigo inserido depois)
+- reviews salvos pelo webhook entram no snapshot na hora (merge), sem
+  consulta nenhuma
+
+Se o Supabase cair, o último snapshot continua sendo servido. Com uma
+réplica local (read_replica), cada snapshot também vai para o arquivo SQLite
+e, no startup, load_replica() o restaura antes da primeira consulta remota.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Set
+
+from http_caching import RenderedJSON
+from review_dedup import fetch_active_reviews, row_content_hash, row_key
+from review_stats import ReviewStatsEngine
+from structured_logging import SAMPLED, get_logger
+
+log = get_logger("review_sync")
+
+REVIEW_COLUMNS = "id,author_name,rating,text,relative_time_description,profile_photo_url,review_time,review_id,content_hash"
+
+# Reviews exibidos em /api/reviews
+MAX_PUBLIC_REVIEWS = 50
+
+
+def format_review(review: dict) -> dict:
+    """Review no formato que o frontend espera"""
+    return {
+        "author_name": review.get("author_name", "Anonymous"),
+        "rating": review.get("rating", 5),
+        "text": review.get("text", ""),
+        "relative_time_description": review.get("relative_time_description", "Recently"),
+        "profile_photo_url": review.get("profile_photo_url") or f"https://ui-avatars.com/api/?name={review.get('author_name', 'User').replace(' ', '+')}&background=4285F4&color=fff&size=128&font-size=0.6&bold=true"
+    }
+
+
+def _newest_first(review: dict):
+    return review.get("review_time") or ""
+
+
+class ReviewSync:
+    def __init__(
+        self,
+        supabase,
+        stats: ReviewStatsEngine,
+        interval: float = 60.0,
+        full_interval: float = 3600.0,
+        page_size: int = 500,
+        replica=None,
+    ):
+        self.supabase = supabase
+        self.stats_engine = stats
+        self.interval = interval
+        self.full_interval = full_interval
+        self.page_size = page_size
+        self.replica = replica
+
+        self._reviews: List[dict] = []  # únicos, mais recente primeiro
+        self._review_ids: Set[str] = set()
+        self._hashes: Set[str] = set()
+        self._counted: Dict[str, tuple] = {}  # linha -> (rating, review_time) já somada nos stats
+        self._rendered: Optional[RenderedJSON] = None
+        self._lock = asyncio.Lock()
+        self._worker: Optional[asyncio.Task] = None
+
+        self.watermark: Optional[str] = None
+        self.source: Optional[str] = None  # "supabase" ou "replica"
+        self.synced_at: Optional[float] = None
+        self.full_synced_at: Optional[float] = None
+        self.failed_at: Optional[float] = None
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self.delta_rows = 0
+        self.merged = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._rendered is not None
+
+    @property
+    def rendered(self) -> Optional[RenderedJSON]:
+        return self._rendered
+
+    # ---- snapshot ----
+
+    def _add(self, review: dict) -> bool:
+        """Adiciona se não for duplicata (review_id ou conteúdo); True se entrou"""
+        review_id = review.get("review_id")
+        if review_id and review_id in self._review_ids:
+            return False
+        review_hash = row_content_hash(review)
+        if review_hash in self._hashes:
+            return False
+        if review_id:
+            self._review_ids.add(review_id)
+        self._hashes.add(review_hash)
+        self._reviews.append(review)
+        return True
+
+    def _advance_watermark(self, rows: List[dict]):
+        for row in rows:
+            review_time = row.get("review_time")
+            if review_time and (self.watermark is None or review_time > self.watermark):
+                self.watermark = review_time
+
+    def _render(self):
+        self._reviews.sort(key=_newest_first, reverse=True)
+        self._rendered = RenderedJSON({"reviews": [format_review(review) for review in self._reviews[:MAX_PUBLIC_REVIEWS]]})
+
+    async def _fetch(self, params: dict) -> List[dict]:
+        response = await self.supabase.get(
+            "google_reviews",
+            timeout=30,
+            params={"select": REVIEW_COLUMNS, "is_active": "eq.true", **params},
+        )
+        if response.status_code != 200:
+            raise Exception(f"Supabase respondeu {response.status_code}")
+        return response.json()
+
+    def _failed(self, e: Exception):
+        self.errors += 1
+        self.failed_at = time.time()
+        self.last_error = str(e)[:200]
+
+    async def _persist(self, method: str, reviews: List[dict]):
+        """Grava na réplica local; falha aqui não afeta o snapshot em memória"""
+        if self.replica is None:
+            return
+        try:
+            await asyncio.to_thread(getattr(self.replica, method), reviews)
+        except Exception as e:
+            log.warning("⚠️ Réplica local de reviews não atualizada: %s", e)
+
+    def _replace(self, rows: List[dict]) -> List[dict]:
+        """Troca o conteúdo do snapshot; retorna os reviews únicos"""
+        self._reviews, self._review_ids, self._hashes = [], set(), set()
+        # Mais recente primeiro: entre duplicatas, vence a versão mais nova
+        for row in sorted(rows, key=_newest_first, reverse=True):
+            self._add(row)
+        self.watermark = None
+        self._advance_watermark(rows)
+        return list(self._reviews)
+
+    async def _rebuild_stats(self, rows: List[dict]):
+        """
+        Stats sobre todas as linhas ativas (inclusive duplicatas de conteúdo,
+        como load_review_stats_rows); sem mudança nas linhas, nada é
+        recalculado e updated_at (ETag) não muda
+        """
+        counted = {row_key(row): (row.get("rating"), row.get("review_time")) for row in rows}
+        if counted == self._counted and self.stats_engine.loaded:
+            return
+
+        async def loader():
+            return rows
+
+        await self.stats_engine.rebuild(loader)
+        self._counted = counted
+
+    def _count(self, row: dict) -> bool:
+        """Soma uma linha nova aos stats; False se ela já foi contada"""
+        key = row_key(row)
+        if key in self._counted:
+            return False
+        self._counted[key] = (row.get("rating"), row.get("review_time"))
+        self.stats_engine.add(row.get("rating"), row.get("review_time"), row.get("review_id"))
+        return True
+
+    async def load_replica(self) -> bool:
+        """Restaura o snapshot da réplica local (startup); True se havia reviews"""
+        if self.replica is None or self.loaded:
+            return False
+        rows = await asyncio.to_thread(self.replica.load_reviews)
+        if not rows:
+            return False
+        async with self._lock:
+            unique = self._replace(rows)
+            await self._rebuild_stats(rows)
+            self._render()
+            self.source = "replica"
+        log.info("💾 Snapshot de reviews restaurado da réplica local: %s reviews", len(unique))
+        return True
+
+    async def full_sync(self):
+        """Relê todos os reviews ativos e troca o snapshot inteiro"""
+        async with self._lock:
+            await self._load()
+
+    async def _load(self):
+        try:
+            rows = await fetch_active_reviews(self.supabase, REVIEW_COLUMNS, self.page_size)
+        except Exception as e:
+            self._failed(e)
+            raise
+
+        unique = self._replace(rows)
+        await self._rebuild_stats(rows)
+        self._render()
+        self.source = "supabase"
+        await self._persist("replace_reviews", rows)
+        self.full_syncs += 1
+        self.synced_at = self.full_synced_at = time.time()
+        self.failed_at = None
+        if len(rows) != len(unique):
+            log.warning("⚠️ Removidos %s reviews duplicados", len(rows) - len(unique), extra=SAMPLED)
+        log.info("✅ Snapshot de reviews carregado: %s reviews únicos", len(unique))
+
+    async def sync(self):
+        """Consulta delta a partir do watermark (full_sync se ainda não há snapshot)"""
+        if not self.loaded or self.watermark is None:
+            await self.full_sync()
+            return
+
+        async with self._lock:
+            added = []
+            while True:
+                # gte: reviews com o mesmo review_time do watermark não se perdem (duplicatas são ignoradas)
+                try:
+                    rows = await self._fetch({
+                        "review_time": f"gte.{self.watermark}",
+                        "order": "review_time.asc",
+                        "limit": str(self.page_size),
+                    })
+                except Exception as e:
+                    self._failed(e)
+                    raise
+                self.delta_rows += len(rows)
+                for row in rows:
+                    # Linhas já vistas (o gte repete as do watermark) não entram de novo
+                    if self._count(row):
+                        added.append(row)
+                        self._add(row)
+                previous = self.watermark
+                self._advance_watermark(rows)
+                # Página cheia: pode haver mais; sem avanço do watermark, parar (evita loop)
+                if len(rows) < self.page_size or self.watermark == previous:
+                    break
+
+            if added:
+                self._render()
+                await self._persist("add_reviews", added)
+                log.info("🔄 %s reviews novos no snapshot (watermark %s)", len(added), self.watermark)
+            self.delta_syncs += 1
+            self.synced_at = time.time()
+            self.failed_at = None
+
+    async def merge(self, rows: List[dict]) -> int:
+        """
+        Reviews recém-salvos (webhook) entram no snapshot sem consultar o banco
+        O watermark não avança: reviews de outras fontes com review_time
+        anterior ainda aparecem no próximo delta
+        """
+        if not self.loaded or not rows:
+            return 0
+        async with self._lock:
+            added = []
+            for row in rows:
+                if self._count(row):
+                    added.append(row)
+                    self._add(row)
+            if added:
+                self._render()
+                await self._persist("add_reviews", added)
+            self.merged += len(added)
+            return len(added)
+
+    async def ensure_loaded(self):
+        """
+        Garante um snapshot para os endpoints; se ainda não há nenhum, carrega
+        agora (no máximo uma tentativa por intervalo enquanto o Supabase falha)
+        """
+        if self.loaded:
+            return
+        if self.failed_at and time.time() - self.failed_at < self.interval:
+            raise Exception(f"Snapshot de reviews indisponível: {self.last_error}")
+        async with self._lock:
+            # Outro request pode ter carregado enquanto este esperava
+            if not self.loaded:
+                await self._load()
+
+    # ---- sincronização em background ----
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                full_due = self.full_synced_at is None or time.time() - self.full_synced_at >= self.full_interval
+                if full_due:
+                    await self.full_sync()
+                else:
+                    await self.sync()
+            except Exception as e:
+                log.warning("⚠️ Falha ao sincronizar reviews, mantendo snapshot atual: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "source": self.source,
+            "running": self._worker is not None,
+            "reviews": len(self._reviews),
+            "watermark": self.watermark,
+            "age_seconds": round(time.time() - self.synced_at, 1) if self.synced_at else None,
+            "full_syncs": self.full_syncs,
+            "delta_syncs": self.delta_syncs,
+            "delta_rows": self.delta_rows,
+            "merged": self.merged,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
@@ -1,19 +1,49 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 from datetime import datetime, timedelta
-import os
+import asyncio
 import uuid
-import httpx
+import time
 import base64
-from typing import List, Optional
+import signal
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="Santos Cleaning Solutions API")
+from supabase_client import SupabaseClient
+from response_cache import SWRCache
+from review_stats import ReviewStatsEngine
+from review_ingest import build_review_id, build_review_row, ingest_review, ingest_reviews_batch, ingest_reviews_concurrent
+from review_dedup import content_hash, fetch_active_reviews, row_content_hash, scan_duplicates
+from pagination import decode_cursor, keyset_filter, keyset_mongo_filter, next_cursor, parse_content_range
+from backend_router import BackendRouter, CircuitBreaker
+from contact_spool import ContactSpool
+from request_metrics import MetricsMiddleware, MongoCommandTimer, render_prometheus
+from structured_logging import SAMPLED, RequestContextMiddleware, apply_logging_settings, get_logger, logging_stats, setup_logging, shutdown_logging
+from fast_json import FastJSONResponse, dumps
+from http_caching import NO_STORE, RenderedJSON, cached_json_response
+from settings import Settings, get_settings, on_reload, reload_settings
+from lead_bulk import bulk_delete_mongo, bulk_delete_supabase, bulk_update_mongo, bulk_update_supabase, validate_filters
+from service_catalog import ServiceCatalog
+from mongo_indexes import check_query_plans, ensure_indexes
+from lead_counts import LeadCountCache
+from idempotency import IdempotencyKeyReused, IdempotencyStore, idempotency_key
+from lead_notifications import NotificationDispatcher
+from lead_export import EXPORT_FORMATS, export_chunks, mongo_lead_pages, supabase_lead_pages
+from review_sync import ReviewSync, format_review
+from read_replica import ReadReplica
+
+# Logs estruturados (JSON) escritos por uma thread separada (ver structured_logging)
+setup_logging(get_settings())
+log = get_logger("server")
+
+app = FastAPI(title="Santos Cleaning Solutions API", default_response_class=FastJSONResponse)
 
 ALLOWED_ORIGINS = [
     "https://santoscsolutions.com",
@@ -34,15 +64,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Duração por rota, tempo em Supabase/MongoDB por request e header Server-Timing
+app.add_middleware(MetricsMiddleware)
+
+# request_id por request (header X-Request-ID), presente em todos os logs do request
+app.add_middleware(RequestContextMiddleware)
+
 # MongoDB connection with short timeout (won't block if MongoDB is down)
 client = AsyncIOMotorClient(
-    os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+    get_settings().mongo_url,
     serverSelectionTimeoutMS=2000,  # 2 seconds timeout
     connectTimeoutMS=2000,
-    socketTimeoutMS=2000
+    socketTimeoutMS=2000,
+    event_listeners=[MongoCommandTimer()]  # tempo de cada comando em /metrics
 )
 db = client.santos_cleaning
 
+# Cliente Supabase compartilhado (pool aberto no startup, fechado no shutdown)
+supabase = SupabaseClient.from_settings(get_settings())
+
+# Circuit breaker por backend: escritas vão direto para o MongoDB enquanto o
+# Supabase estiver com o circuito aberto (ver backend_router)
+def make_breaker(name: str, enabled: bool = True) -> CircuitBreaker:
+    settings = get_settings()
+    return CircuitBreaker(
+        name,
+        enabled=enabled,
+        window=settings.breaker_window,
+        min_calls=settings.breaker_min_calls,
+        failure_rate=settings.breaker_failure_rate,
+        open_seconds=settings.breaker_open_seconds,
+    )
+
+backends = BackendRouter(
+    [make_breaker("supabase", enabled=supabase.configured), make_breaker("mongo")],
+    probe_interval=get_settings().breaker_probe_interval,
+)
+supabase.breaker = backends["supabase"]
+
+# Totais de leads por status do fallback MongoDB (get_leads sem count_documents)
+lead_counts = LeadCountCache(resync_seconds=get_settings().lead_count_resync_seconds)
+
 # Security
 security = HTTPBearer()
 
@@ -98,93 +160,231 @@ class LeadUpdate(BaseModel):
     notes: Optional[str] = None
     assigned_to: Optional[str] = None
 
+class LeadBulkDelete(BaseModel):
+    ids: Optional[List[str]] = None
+    filters: Optional[Dict[str, List[str]]] = None  # {"campo": [valores]}, campos combinados com OU
+
+class LeadBulkUpdate(LeadBulkDelete):
+    update: LeadUpdate
+
 @app.get("/")
 async def root():
     return {"message": "Santos Cleaning Solutions API"}
 
+def component_stats() -> dict:
+    """Estado dos componentes em /api/health (só contadores em memória: nada de I/O no event loop)"""
+    return {
+        "supabase_pool": supabase.pool_stats(),
+        "backends": backends.stats(),
+        "reviews_cache": reviews_cache.stats(),
+        "lead_counts": lead_counts.stats(),
+        "review_sync": review_sync.stats(),
+        "service_catalog": service_catalog.stats(),
+        "read_replica": read_replica.stats() if read_replica is not None else None,
+        "idempotency": idempotency_store.stats(),
+        "notifications": notifications.stats(),
+        "logging": logging_stats(),
+    }
+
 @app.get("/api/health")
 async def health_check():
     try:
         # Test database connection (optional, won't fail if MongoDB is down)
-        await db.command("ping")
-        return {"status": "healthy", "database": "connected", "timestamp": datetime.utcnow().isoformat()}
+        await backends["mongo"].call(db.command, "ping")
+        status = {"status": "healthy", "database": "connected"}
     except Exception as e:
         # MongoDB down, but API still works for Supabase endpoints
-        return {"status": "healthy", "database": "disconnected", "message": "MongoDB offline, Supabase endpoints operational", "timestamp": datetime.utcnow().isoformat()}
+        status = {"status": "healthy", "database": "disconnected", "message": "MongoDB offline, Supabase endpoints operational"}
+    return {**status, **component_stats(), "timestamp": datetime.utcnow().isoformat()}
+
+# Métricas no formato de texto do Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# Modo de gravação do formulário de contato:
+# "sync" (padrão) grava no Supabase/MongoDB antes de responder;
+# "spool" grava numa fila local durável e responde na hora (ver contact_spool)
+CONTACT_WRITE_MODE = get_settings().contact_write_mode
+contact_spool = ContactSpool(
+    get_settings().contact_spool_path,
+    batch_size=get_settings().contact_spool_batch_size,
+    poll_interval=get_settings().contact_spool_poll_interval,
+    base_backoff=get_settings().contact_spool_backoff,
+    max_backoff=get_settings().contact_spool_max_backoff,
+    max_attempts=get_settings().contact_spool_max_attempts,
+) if CONTACT_WRITE_MODE == "spool" else None
+
+def build_lead_row(contact: dict) -> dict:
+    """Dados do lead para a tabela leads do Supabase"""
+    return {
+        "name": contact["name"],
+        "phone": contact["phone"],
+        "email": contact["email"],
+        "message": contact.get("message") or "",
+        "sms_consent": contact["sms_consent"],
+        "language": contact["language"],
+        "source": contact["source"],
+        "status": "new"
+    }
+
+def build_mongo_contact(contact: dict, lead_id: str, created_at: datetime) -> dict:
+    """Documento do lead para o fallback MongoDB (coleção contacts)"""
+    return {
+        **contact,
+        "id": lead_id,
+        "created_at": created_at,
+        "status": "new",
+        "user_agent": "",
+        "ip_address": ""
+    }
+
+async def deliver_spooled_supabase(entries: List[dict]):
+    rows = [
+        {**build_lead_row(entry["contact"]), "id": entry["id"], "created_at": entry["created_at"]}
+        for entry in entries
+    ]
+    response = await supabase.post(
+        "leads",
+        params={"on_conflict": "id"},
+        headers={
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal,resolution=ignore-duplicates"
+        },
+        json=rows
+    )
+    if response.status_code not in [200, 201]:
+        raise Exception(f"Supabase error {response.status_code} - {response.text}")
+
+async def deliver_spooled_mongo(entries: List[dict]):
+    result = await backends["mongo"].call(
+        db.contacts.bulk_write,
+        [
+            UpdateOne(
+                {"id": entry["id"]},
+                {"$setOnInsert": build_mongo_contact(entry["contact"], entry["id"], datetime.fromisoformat(entry["created_at"]))},
+                upsert=True
+            )
+            for entry in entries
+        ],
+        ordered=False
+    )
+    # Reentregas de leads já salvos não contam
+    lead_counts.record_insert("new", result.upserted_count)
+    log.warning("⚠️ Fallback MongoDB: %s leads da fila salvos", len(entries))
+
+SPOOL_WRITERS = {"supabase": deliver_spooled_supabase, "mongo": deliver_spooled_mongo}
+
+async def deliver_spooled_leads(entries: List[dict]):
+    """
+    Entrega um lote da fila: um POST em massa no Supabase, ou bulk_write no
+    MongoDB se o Supabase falhar ou estiver com o circuito aberto.
+    Idempotente pelo id gerado no enfileiramento
+    """
+    last_error = None
+    for backend in backends.route():
+        try:
+            await SPOOL_WRITERS[backend](entries)
+            return
+        except Exception as backend_error:
+            last_error = backend_error
+            log.error("❌ Erro entregando leads da fila no %s: %s", backend, backend_error)
+    raise last_error or Exception("No backend available")
+
+async def save_lead_supabase(contact: ContactRequest) -> str:
+    """Insere o lead no Supabase e retorna o id gerado"""
+    supabase_response = await supabase.post(
+        "leads",
+        headers={
+            "Content-Type": "application/json",
+            "Prefer": "return=representation"
+        },
+        json=build_lead_row(contact.dict())
+    )
+    
+    if supabase_response.status_code not in [200, 201]:
+        raise Exception(f"Supabase error {supabase_response.status_code} - {supabase_response.text}")
+    
+    supabase_data = supabase_response.json()
+    log.info("✅ Lead salvo no Supabase: %s - %s", contact.name, contact.email, extra=SAMPLED)
+    return supabase_data[0]["id"] if supabase_data else str(uuid.uuid4())
+
+async def save_lead_mongo(contact: ContactRequest) -> str:
+    """Insere o lead no MongoDB (coleção contacts) e retorna o id gerado"""
+    contact_data = build_mongo_contact(contact.dict(), str(uuid.uuid4()), datetime.utcnow())
+    await backends["mongo"].call(db.contacts.insert_one, contact_data)
+    lead_counts.record_insert(contact_data["status"])
+    log.warning("⚠️ Fallback MongoDB: Lead salvo - %s", contact.name)
+    return contact_data["id"]
+
+LEAD_WRITERS = {"supabase": save_lead_supabase, "mongo": save_lead_mongo}
+
+# Notificações de novos leads (webhook/n8n/SMTP) entregues em background
+notifications = NotificationDispatcher.from_settings(get_settings())
+
+def notify_new_lead(lead_id: str, contact: ContactRequest):
+    """Só enfileira: a entrega (agrupada em resumos) fica com os workers"""
+    notifications.notify({"id": lead_id, **contact.dict(), "created_at": datetime.utcnow().isoformat()})
+
+# Respostas recentes de /api/contact e /api/bookings por chave de idempotência
+idempotency_store = IdempotencyStore(
+    ttl=get_settings().idempotency_window,
+    max_entries=get_settings().idempotency_max_entries,
+)
+
+async def run_idempotent(scope: str, header_key: Optional[str], payload: dict, response: Response, handler):
+    """
+    Executa a submissão uma vez por Idempotency-Key (ou email + telefone +
+    payload); repetições recebem a resposta original e o header Idempotent-Replayed
+    """
+    key = idempotency_key(scope, header_key, payload)
+    try:
+        result, replayed = await idempotency_store.run(key, payload, handler)
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key already used with a different payload")
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 # Contact form submission
 @app.post("/api/contact")
-async def submit_contact(contact: ContactRequest):
+async def submit_contact(contact: ContactRequest, response: Response, idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key")):
+    return await run_idempotent("contact", idempotency_key_header, contact.dict(), response, lambda: save_contact(contact))
+
+async def save_contact(contact: ContactRequest):
     try:
-        # Dados do lead
-        lead_data = {
-            "name": contact.name,
-            "phone": contact.phone,
-            "email": contact.email,
-            "message": contact.message or "",
-            "sms_consent": contact.sms_consent,
-            "language": contact.language,
-            "source": contact.source,
-            "status": "new"
-        }
+        if contact_spool is not None:
+            # Modo write-behind: gravar na fila local e responder imediatamente
+            lead_id = str(uuid.uuid4())
+            await contact_spool.enqueue(lead_id, {
+                "id": lead_id,
+                "created_at": datetime.utcnow().isoformat(),
+                "contact": contact.dict()
+            })
+            notify_new_lead(lead_id, contact)
+            log.info("📬 Novo lead recebido (fila): %s (%s) - Fonte: %s", contact.name, contact.email, contact.source, extra=SAMPLED)
+            return {
+                "success": True,
+                "message": "Contact request submitted successfully",
+                "id": lead_id
+            }
         
-        # Tentar salvar no Supabase primeiro
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        # Supabase primeiro, MongoDB como fallback; backends com circuito aberto são pulados
+        lead_id = None
+        last_error = None
+        for backend in backends.route():
+            try:
+                lead_id = await LEAD_WRITERS[backend](contact)
+                break
+            except Exception as backend_error:
+                last_error = backend_error
+                log.error("❌ Erro salvando lead no %s: %s", backend, backend_error)
         
-        if supabase_url and supabase_key:
-            async with httpx.AsyncClient() as client:
-                try:
-                    # Inserir lead no Supabase
-                    supabase_response = await client.post(
-                        f"{supabase_url}/rest/v1/leads",
-                        headers={
-                            "apikey": supabase_key,
-                            "Authorization": f"Bearer {supabase_key}",
-                            "Content-Type": "application/json",
-                            "Prefer": "return=representation"
-                        },
-                        json=lead_data
-                    )
-                    
-                    if supabase_response.status_code in [200, 201]:
-                        supabase_data = supabase_response.json()
-                        lead_id = supabase_data[0]["id"] if supabase_data else str(uuid.uuid4())
-                        print(f"✅ Lead salvo no Supabase: {contact.name} - {contact.email}")
-                    else:
-                        print(f"❌ Erro Supabase: {supabase_response.status_code} - {supabase_response.text}")
-                        raise Exception("Supabase error")
-                        
-                except Exception as supabase_error:
-                    print(f"❌ Erro conectando ao Supabase: {str(supabase_error)}")
-                    # Fallback para MongoDB
-                    contact_data = {
-                        **contact.dict(),
-                        "id": str(uuid.uuid4()),
-                        "created_at": datetime.utcnow(),
-                        "status": "new",
-                        "user_agent": "",
-                        "ip_address": ""
-                    }
-                    result = await db.contacts.insert_one(contact_data)
-                    lead_id = contact_data["id"]
-                    print(f"⚠️ Fallback MongoDB: Lead salvo - {contact.name}")
-        else:
-            print("❌ Supabase não configurado, usando MongoDB")
-            # Fallback para MongoDB se Supabase não configurado
-            contact_data = {
-                **contact.dict(),
-                "id": str(uuid.uuid4()),
-                "created_at": datetime.utcnow(),
-                "status": "new",
-                "user_agent": "",
-                "ip_address": ""
-            }
-            result = await db.contacts.insert_one(contact_data)
-            lead_id = contact_data["id"]
+        if lead_id is None:
+            raise last_error or Exception("No backend available")
         
-        # TODO: Enviar notificação por email/SMS/webhook
-        print(f"📬 Novo lead recebido: {contact.name} ({contact.email}) - Fonte: {contact.source}")
+        notify_new_lead(lead_id, contact)
+        log.info("📬 Novo lead recebido: %s (%s) - Fonte: %s", contact.name, contact.email, contact.source, extra=SAMPLED)
         
         return {
             "success": True,
@@ -192,127 +392,168 @@ async def submit_contact(contact: ContactRequest):
             "id": lead_id
         }
     except Exception as e:
-        print(f"❌ Erro geral ao salvar lead: {str(e)}")
+        log.error("❌ Erro geral ao salvar lead: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to submit contact: {str(e)}")
 
+# Estado da fila write-behind do formulário de contato
+@app.get("/api/contact/queue")
+async def get_contact_queue():
+    """
+    Profundidade da fila, atraso de drenagem (idade do lead mais antigo
+    pendente) e leads na dead letter; contadores em memória, sem ler o arquivo
+    """
+    if contact_spool is None:
+        return {"mode": CONTACT_WRITE_MODE, "enabled": False}
+    try:
+        return {"mode": CONTACT_WRITE_MODE, "enabled": True, **contact_spool.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading contact queue: {str(e)}")
+
+# Cache de /api/reviews (reviews só mudam quando o webhook do n8n dispara)
+reviews_cache = SWRCache(
+    "reviews",
+    ttl=get_settings().reviews_cache_ttl,
+    stale_ttl=get_settings().reviews_cache_stale_ttl,
+)
+
+# Agregados de /api/reviews/stats (atualizados pelo webhook)
+review_stats = ReviewStatsEngine()
+
+# Réplica local (SQLite) dos snapshots de reviews e serviços: restaurada no startup
+read_replica = ReadReplica(get_settings().read_replica_path) if get_settings().read_replica_enabled else None
+
+# Snapshot de reviews + stats sincronizado em background (delta por review_time)
+# Com ele ligado, /api/reviews e /api/reviews/stats não consultam o Supabase
+review_sync = ReviewSync(
+    supabase,
+    review_stats,
+    interval=get_settings().reviews_sync_interval,
+    full_interval=get_settings().reviews_sync_full_interval,
+    replica=read_replica,
+)
+REVIEWS_SYNC_ENABLED = get_settings().reviews_sync_enabled
+
+async def load_reviews_payload():
+    """
+    Busca, deduplica e formata os reviews do Supabase
+    Usado pelo cache de /api/reviews - levanta exceção em caso de erro
+    Retorna o JSON já codificado: o cache guarda os bytes prontos e cada
+    request só os devolve
+    """
+    # Buscar reviews do Supabase ordenados por data
+    response = await supabase.get(
+        "google_reviews",
+        timeout=10,
+        params={
+            "select": "author_name,rating,text,relative_time_description,profile_photo_url,review_time,review_id,content_hash",
+            "order": "review_time.desc",
+            "limit": "100",  # Buscar mais para filtrar duplicatas
+            "is_active": "eq.true"
+        }
+    )
+    
+    if response.status_code == 200:
+        supabase_reviews = response.json()
+        
+        if supabase_reviews:
+            log.info("✅ %s reviews carregados do Supabase", len(supabase_reviews), extra=SAMPLED)
+            
+            # Deduplicação: remover reviews duplicados
+            seen_review_ids = set()
+            seen_content = set()
+            unique_reviews = []
+            
+            for review in supabase_reviews:
+                # Primeiro, verificar por review_id (mais confiável)
+                review_id = review.get("review_id")
+                if review_id and review_id in seen_review_ids:
+                    continue  # Pular duplicata por review_id
+                
+                # Se não tem review_id ou é único, verificar por conteúdo
+                review_hash = row_content_hash(review)
+                
+                if review_hash in seen_content:
+                    continue  # Pular duplicata por conteúdo
+                
+                # É único, adicionar
+                if review_id:
+                    seen_review_ids.add(review_id)
+                seen_content.add(review_hash)
+                unique_reviews.append(review)
+            
+            if len(supabase_reviews) != len(unique_reviews):
+                log.warning("⚠️ Removidos %s reviews duplicados", len(supabase_reviews) - len(unique_reviews), extra=SAMPLED)
+            
+            # Limitar a 50 reviews únicos
+            unique_reviews = unique_reviews[:50]
+            
+            # Formatar reviews para o frontend
+            formatted_reviews = [format_review(review) for review in unique_reviews]
+            
+            return RenderedJSON({"reviews": formatted_reviews})
+        else:
+            log.warning("⚠️ Nenhum review encontrado no Supabase, retornando dados padrão")
+    else:
+        log.error("❌ Erro ao buscar reviews do Supabase: %s", response.status_code, extra={"response_text": response.text})
+        # Não cachear falhas: o cache mantém o último valor bom
+        raise Exception(f"Supabase respondeu {response.status_code}")
+
+    # Fallback para reviews padrão
+    return RenderedJSON({
+        "reviews": []
+    })
+
 # Get reviews from Supabase
 @app.get("/api/reviews")
-async def get_reviews():
+async def get_reviews(request: Request):
     """
     Busca reviews do Supabase para exibir no frontend
     Mantém compatibilidade total com frontend existente
+    Responde 304 quando o If-None-Match bate com o ETag atual
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
-        if not supabase_url or not supabase_key:
-            print("⚠️ Supabase não configurado, retornando reviews padrão")
-            return {
-                "reviews": []
-            }
+        if not supabase.configured:
+            log.warning("⚠️ Supabase não configurado, retornando reviews padrão", extra=SAMPLED)
+            return cached_json_response(request, {"reviews": []}, NO_STORE)
         
-        async with httpx.AsyncClient(timeout=10) as client:
-            # Buscar reviews do Supabase ordenados por data
-            response = await client.get(
-                f"{supabase_url}/rest/v1/google_reviews",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}"
-                },
-                params={
-                    "select": "author_name,rating,text,relative_time_description,profile_photo_url,review_time,review_id",
-                    "order": "review_time.desc",
-                    "limit": "100",  # Buscar mais para filtrar duplicatas
-                    "is_active": "eq.true"
-                }
-            )
-            
-            if response.status_code == 200:
-                supabase_reviews = response.json()
-                
-                if supabase_reviews:
-                    print(f"✅ {len(supabase_reviews)} reviews carregados do Supabase")
-                    
-                    # Deduplicação: remover reviews duplicados
-                    import hashlib
-                    seen_review_ids = set()
-                    seen_content = set()
-                    unique_reviews = []
-                    
-                    for review in supabase_reviews:
-                        # Primeiro, verificar por review_id (mais confiável)
-                        review_id = review.get("review_id")
-                        if review_id and review_id in seen_review_ids:
-                            continue  # Pular duplicata por review_id
-                        
-                        # Se não tem review_id ou é único, verificar por conteúdo
-                        author = review.get("author_name", "").strip().lower()
-                        text = review.get("text", "").strip()
-                        rating = review.get("rating", 0)
-                        
-                        # Normalizar texto para comparação
-                        text_normalized = " ".join(text.lower().split())
-                        content_hash = hashlib.md5(f"{author}_{rating}_{text_normalized}".encode()).hexdigest()
-                        
-                        if content_hash in seen_content:
-                            continue  # Pular duplicata por conteúdo
-                        
-                        # É único, adicionar
-                        if review_id:
-                            seen_review_ids.add(review_id)
-                        seen_content.add(content_hash)
-                        unique_reviews.append(review)
-                    
-                    if len(supabase_reviews) != len(unique_reviews):
-                        print(f"⚠️ Removidos {len(supabase_reviews) - len(unique_reviews)} reviews duplicados")
-                    
-                    # Limitar a 50 reviews únicos
-                    unique_reviews = unique_reviews[:50]
-                    
-                    # Formatar reviews para o frontend
-                    formatted_reviews = []
-                    for review in unique_reviews:
-                        formatted_reviews.append({
-                            "author_name": review.get("author_name", "Anonymous"),
-                            "rating": review.get("rating", 5),
-                            "text": review.get("text", ""),
-                            "relative_time_description": review.get("relative_time_description", "Recently"),
-                            "profile_photo_url": review.get("profile_photo_url") or f"https://ui-avatars.com/api/?name={review.get('author_name', 'User').replace(' ', '+')}&background=4285F4&color=fff&size=128&font-size=0.6&bold=true"
-                        })
-                    
-                    return {"reviews": formatted_reviews}
-                else:
-                    print("⚠️ Nenhum review encontrado no Supabase, retornando dados padrão")
-            else:
-                print(f"❌ Erro ao buscar reviews do Supabase: {response.status_code}")
-                print(f"❌ Resposta: {response.text}")
-        
-        # Fallback para reviews padrão
-        return {
-            "reviews": []
-        }
+        if REVIEWS_SYNC_ENABLED:
+            await review_sync.ensure_loaded()
+            rendered = review_sync.rendered
+        else:
+            rendered = await reviews_cache.get(load_reviews_payload)
+        return cached_json_response(request, rendered, get_settings().reviews_cache_control)
         
     except Exception as e:
-        print(f"❌ Erro crítico ao buscar reviews: {str(e)}")
+        log.error("❌ Erro crítico ao buscar reviews: %s", e)
         # Fallback seguro
-        return {
-            "reviews": []
-        }
+        return cached_json_response(request, {"reviews": []}, NO_STORE)
+
+async def load_review_stats_rows():
+    """
+    Lê todos os reviews ativos para (re)construir os agregados
+    Só roda no cold start ou em reconciliação explícita
+    """
+    try:
+        rows = await fetch_active_reviews(supabase, "id,rating,review_time,review_id")
+    except Exception as e:
+        log.error("❌ Erro ao buscar reviews para stats: %s", e)
+        raise
+    
+    log.info("✅ Stats reconstruídos a partir de %s reviews", len(rows))
+    return rows
 
 # Get reviews statistics for the dashboard panel
 @app.get("/api/reviews/stats")
-async def get_reviews_stats():
+async def get_reviews_stats(request: Request):
     """
     Calcula estatísticas dos reviews para o painel dinâmico
     Retorna média, total de reviews, distribuição de estrelas, etc.
+    last_updated é a hora da última mudança nos agregados, então o ETag só
+    muda quando os stats mudam
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
-        if not supabase_url or not supabase_key:
-            print("⚠️ Supabase não configurado, retornando stats padrão")
+        if not supabase.configured:
+            log.warning("⚠️ Supabase não configurado, retornando stats padrão", extra=SAMPLED)
             return {
                 "average_rating": 4.8,
                 "total_reviews": 47,
@@ -320,59 +561,22 @@ async def get_reviews_stats():
                 "last_updated": datetime.utcnow().isoformat()
             }
         
-        async with httpx.AsyncClient(timeout=10) as client:
-            # Buscar todos os reviews para calcular estatísticas
-            response = await client.get(
-                f"{supabase_url}/rest/v1/google_reviews",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}"
-                },
-                params={
-                    "select": "rating,review_time",
-                    "is_active": "eq.true"
-                }
-            )
-            
-            if response.status_code == 200:
-                all_reviews = response.json()
-                
-                if all_reviews:
-                    # Calcular estatísticas
-                    total_reviews = len(all_reviews)
-                    ratings = [review.get("rating", 5) for review in all_reviews if review.get("rating")]
-                    
-                    if ratings:
-                        average_rating = round(sum(ratings) / len(ratings), 1)
-                        
-                        # Distribuição de estrelas
-                        rating_distribution = {"5": 0, "4": 0, "3": 0, "2": 0, "1": 0}
-                        for rating in ratings:
-                            rating_key = str(rating)
-                            if rating_key in rating_distribution:
-                                rating_distribution[rating_key] += 1
-                        
-                        # Encontrar o review mais recente
-                        latest_review_time = max([review.get("review_time", "") for review in all_reviews], default="")
-                        
-                        stats = {
-                            "average_rating": average_rating,
-                            "total_reviews": total_reviews,
-                            "rating_distribution": rating_distribution,
-                            "latest_review_time": latest_review_time,
-                            "last_updated": datetime.utcnow().isoformat(),
-                            "source": "supabase"
-                        }
-                        
-                        print(f"✅ Stats calculados: {average_rating}⭐ ({total_reviews} reviews)")
-                        return stats
-                    else:
-                        print("⚠️ Nenhum rating válido encontrado")
-                else:
-                    print("⚠️ Nenhum review encontrado para calcular stats")
-            else:
-                print(f"❌ Erro ao buscar reviews para stats: {response.status_code}")
+        # Contadores em memória: mantidos pelo review_sync, ou lidos do banco só no cold start
+        if REVIEWS_SYNC_ENABLED:
+            await review_sync.ensure_loaded()
+        else:
+            await review_stats.ensure_loaded(load_review_stats_rows)
+        snapshot = review_stats.snapshot()
         
+        if snapshot:
+            return cached_json_response(request, {
+                **snapshot,
+                "last_updated": review_stats.updated_at,
+                "source": (review_sync.source if REVIEWS_SYNC_ENABLED else None) or "supabase"
+            }, get_settings().reviews_stats_cache_control)
+        else:
+            log.warning("⚠️ Nenhum rating válido encontrado", extra=SAMPLED)
+    
         # Fallback para stats padrão
         return {
             "average_rating": 4.8,
@@ -383,7 +587,7 @@ async def get_reviews_stats():
         }
         
     except Exception as e:
-        print(f"❌ Erro crítico ao calcular stats: {str(e)}")
+        log.error("❌ Erro crítico ao calcular stats: %s", e)
         # Fallback seguro
         return {
             "average_rating": 4.8,
@@ -393,18 +597,55 @@ async def get_reviews_stats():
             "source": "error_fallback"
         }
 
+# Reconciliar agregados de stats com o banco
+@app.post("/api/reviews/stats/reconcile")
+async def reconcile_reviews_stats():
+    """
+    Recalcula os agregados de /api/reviews/stats a partir do Supabase
+    Útil após edições manuais na tabela google_reviews
+    """
+    if not supabase.configured:
+        raise HTTPException(status_code=400, detail="Supabase não configurado")
+    
+    try:
+        if REVIEWS_SYNC_ENABLED:
+            await review_sync.full_sync()
+        else:
+            await review_stats.rebuild(load_review_stats_rows)
+        return {
+            "success": True,
+            "stats": review_stats.snapshot(),
+            "last_updated": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reconciling stats: {str(e)}")
+
 # Service types
+# Catálogo em memória: carregado no startup, atualizado por change stream/polling
+service_catalog = ServiceCatalog(
+    poll_interval=get_settings().services_catalog_poll_interval,
+    use_change_stream=get_settings().services_catalog_change_stream,
+    replica=read_replica,
+)
+
 @app.get("/api/services")
-async def get_services():
+async def get_services(request: Request):
+    """
+    Serviços ativos direto da memória, com `version` (hash do catálogo)
+    Continua respondendo a última versão carregada se o MongoDB cair
+    """
     try:
-        services = await db.service_types.find({"active": True}, {"_id": 0}).to_list(length=None)
-        return {"services": services}
+        rendered = await service_catalog.get()
+        return cached_json_response(request, rendered, get_settings().services_cache_control)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching services: {str(e)}")
 
 # Book a service
 @app.post("/api/bookings")
-async def create_booking(booking: ServiceBooking):
+async def create_booking(booking: ServiceBooking, response: Response, idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key")):
+    return await run_idempotent("booking", idempotency_key_header, booking.dict(), response, lambda: save_booking(booking))
+
+async def save_booking(booking: ServiceBooking):
     try:
         booking_data = {
             **booking.dict(),
@@ -447,20 +688,20 @@ async def add_review(review: Review):
 
 # Webhook para receber reviews do n8n - NOVA FUNCIONALIDADE
 @app.post("/api/webhook/reviews-update")
-async def receive_reviews_webhook(webhook_data: ReviewWebhook):
+async def receive_reviews_webhook(webhook_data: ReviewWebhook, mode: Optional[str] = None):
     """
     Recebe reviews do n8n e salva no Supabase
     Mantém 100% de compatibilidade com sistema existente
+    
+    mode: "batch" (consultas e inserção em lote), "concurrent" (reviews em paralelo,
+    limitado por reviews_webhook_concurrency) ou "sequential" (um review por vez)
+    Padrão definido por reviews_webhook_mode (settings)
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
-        print(f"🔔 Webhook recebido: {webhook_data.total_reviews} reviews de {webhook_data.business_name}")
-        print(f"⭐ Rating médio: {webhook_data.average_rating}")
+        log.info("🔔 Webhook recebido: %s reviews de %s", webhook_data.total_reviews, webhook_data.business_name, extra={"average_rating": webhook_data.average_rating})
         
-        if not supabase_url or not supabase_key:
-            print("⚠️ Supabase não configurado, retornando sucesso sem salvar")
+        if not supabase.configured:
+            log.warning("⚠️ Supabase não configurado, retornando sucesso sem salvar")
             return {
                 "success": True,
                 "message": "Reviews recebidos (Supabase não configurado)",
@@ -468,139 +709,60 @@ async def receive_reviews_webhook(webhook_data: ReviewWebhook):
                 "average_rating": webhook_data.average_rating
             }
         
-        reviews_saved = 0
-        reviews_skipped = 0
-        reviews_errors = 0
+        settings = get_settings()
+        mode = (mode or settings.reviews_webhook_mode).lower()
+        started = time.perf_counter()
         
-        async with httpx.AsyncClient(timeout=30) as client:
+        if mode == "batch":
+            outcome = await ingest_reviews_batch(
+                supabase,
+                webhook_data.reviews,
+                webhook_data.timestamp,
+                batch_size=settings.reviews_webhook_batch_size
+            )
+        elif mode == "concurrent":
+            outcome = await ingest_reviews_concurrent(
+                supabase,
+                webhook_data.reviews,
+                webhook_data.timestamp,
+                concurrency=settings.reviews_webhook_concurrency
+            )
+        else:
+            outcome = {"saved": 0, "skipped": 0, "errors": 0, "inserted": []}
             for review in webhook_data.reviews:
                 try:
-                    # Gerar ID único e consistente
-                    import re
-                    import hashlib
-                    
-                    author_clean = review.get('author_name', 'anonymous').strip().lower()
-                    author_clean = re.sub(r'[^a-z0-9_]+', '_', author_clean)  # Normalizar caracteres
-                    review_timestamp = review.get('review_time', webhook_data.timestamp)
-                    
-                    # Converter timestamp para segundos Unix (arredondar para evitar variações)
-                    try:
-                        dt = datetime.fromisoformat(review_timestamp.replace('Z', '+00:00'))
-                        # Arredondar para o minuto mais próximo para evitar duplicatas por segundos
-                        timestamp_seconds = int(dt.replace(second=0, microsecond=0).timestamp())
-                    except:
-                        timestamp_seconds = int(datetime.now().replace(second=0, microsecond=0).timestamp())
-                    
-                    # Usar hash do texto também para garantir unicidade
-                    text_normalized = " ".join(review.get('text', '').strip().lower().split())
-                    text_hash = hashlib.md5(text_normalized.encode()).hexdigest()[:8]
-                    review_id = f"gp_{author_clean}_{timestamp_seconds}_{text_hash}"
-                    
-                    # Verificar se review já existe por review_id
-                    check_by_id_response = await client.get(
-                        f"{supabase_url}/rest/v1/google_reviews",
-                        headers={
-                            "apikey": supabase_key,
-                            "Authorization": f"Bearer {supabase_key}"
-                        },
-                        params={
-                            "select": "review_id",
-                            "review_id": f"eq.{review_id}",
-                            "limit": "1"
-                        }
-                    )
-                    
-                    if check_by_id_response.status_code == 200 and len(check_by_id_response.json()) > 0:
-                        reviews_skipped += 1
-                        print(f"⏭️ Review já existe (por review_id): {review_id}")
-                        continue
-                    
-                    # Verificar também por conteúdo (autor + texto + rating) para evitar duplicatas
-                    # mesmo com review_id diferente
-                    author = review.get('author_name', '').strip().lower()
-                    text = review.get('text', '').strip()
-                    rating = review.get('rating', 0)
-                    
-                    # Buscar reviews com mesmo autor e rating
-                    check_by_content_response = await client.get(
-                        f"{supabase_url}/rest/v1/google_reviews",
-                        headers={
-                            "apikey": supabase_key,
-                            "Authorization": f"Bearer {supabase_key}"
-                        },
-                        params={
-                            "select": "id,author_name,text,rating",
-                            "author_name": f"ilike.{author}",
-                            "rating": f"eq.{rating}",
-                            "is_active": "eq.true",
-                            "limit": "10"
-                        }
-                    )
-                    
-                    if check_by_content_response.status_code == 200:
-                        existing_reviews = check_by_content_response.json()
-                        text_normalized_new = " ".join(text.lower().split())
-                        
-                        is_duplicate = False
-                        for existing in existing_reviews:
-                            existing_text = existing.get('text', '').strip()
-                            existing_text_normalized = " ".join(existing_text.lower().split())
-                            
-                            # Comparar textos normalizados (ignorar diferenças de espaços)
-                            if existing_text_normalized == text_normalized_new:
-                                is_duplicate = True
-                                reviews_skipped += 1
-                                print(f"⏭️ Review já existe (por conteúdo): {author} - ID {existing.get('id')}")
-                                break
-                        
-                        if is_duplicate:
-                            continue
-                    
-                    # Preparar dados para Supabase - compatível com estrutura existente
-                    review_data = {
-                        "review_id": review_id,
-                        "author_name": review.get("author_name", "Cliente Anônimo")[:255],
-                        "author_url": review.get("author_url"),
-                        "language": review.get("language", "pt")[:10],
-                        "profile_photo_url": review.get("profile_photo_url") or f"https://ui-avatars.com/api/?name={review.get('author_name', 'Cliente')}&background=4285F4&color=fff&size=128",
-                        "rating": max(1, min(5, review.get("rating", 5))),  # Garantir range 1-5
-                        "relative_time_description": review.get("relative_time_description", "Recente")[:100],
-                        "text": review.get("text", "")[:5000],
-                        "review_time": review.get("review_time"),
-                        "review_timestamp": timestamp_seconds,
-                        "translated": review.get("translated", False),
-                        "original_language": review.get("original_language", review.get("language", "pt"))[:10],
-                        "original_text": review.get("text", "")[:5000],
-                        "is_active": True,
-                        "is_featured": review.get("rating", 5) >= 4,  # 4+ estrelas são featured
-                        "response_from_owner": None,
-                        "response_time": None,
-                        "helpful_count": 0
-                    }
-                    
-                    # Inserir review no Supabase
-                    insert_response = await client.post(
-                        f"{supabase_url}/rest/v1/google_reviews",
-                        headers={
-                            "apikey": supabase_key,
-                            "Authorization": f"Bearer {supabase_key}",
-                            "Content-Type": "application/json",
-                            "Prefer": "return=minimal"
-                        },
-                        json=review_data
-                    )
-                    
-                    if insert_response.status_code in [200, 201]:
-                        reviews_saved += 1
-                        print(f"✅ Review salvo: {review.get('author_name', 'Anônimo')} - {review.get('rating', 5)}⭐")
-                    else:
-                        reviews_errors += 1
-                        print(f"❌ Erro ao salvar review: {insert_response.status_code} - {insert_response.text}")
-                        
+                    # Gerar ID único e consistente + content_hash
+                    review_id, timestamp_seconds = build_review_id(review, webhook_data.timestamp)
+                    review_data = build_review_row(review, review_id, timestamp_seconds)
                 except Exception as review_error:
-                    reviews_errors += 1
-                    print(f"❌ Erro processando review individual: {str(review_error)}")
+                    outcome["errors"] += 1
+                    log.error("❌ Erro processando review individual: %s", review_error)
                     continue
+                
+                status, row = await ingest_review(supabase, review_data)
+                if status == "saved":
+                    outcome["saved"] += 1
+                    outcome["inserted"].append(row)
+                elif status == "skipped":
+                    outcome["skipped"] += 1
+                else:
+                    outcome["errors"] += 1
+            outcome["timings_ms"] = {"process_ms": round((time.perf_counter() - started) * 1000, 2)}
+        
+        reviews_saved = outcome["saved"]
+        reviews_skipped = outcome["skipped"]
+        reviews_errors = outcome["errors"]
+        timings = outcome["timings_ms"]
+        if REVIEWS_SYNC_ENABLED:
+            # Novos reviews entram no snapshot (e nos stats) sem esperar o próximo delta
+            await review_sync.merge(outcome["inserted"])
+        else:
+            for row in outcome["inserted"]:
+                review_stats.add(row["rating"], row["review_time"], row["review_id"])
+        
+        # Novos reviews: descartar o cache de /api/reviews
+        if reviews_saved > 0:
+            reviews_cache.invalidate()
         
         # Resposta completa com estatísticas
         result = {
@@ -613,15 +775,17 @@ async def receive_reviews_webhook(webhook_data: ReviewWebhook):
             "business_name": webhook_data.business_name,
             "average_rating": webhook_data.average_rating,
             "user_ratings_total": webhook_data.user_ratings_total,
-            "timestamp": webhook_data.timestamp
+            "timestamp": webhook_data.timestamp,
+            "mode": mode,
+            "timings_ms": timings
         }
         
-        print(f"📊 RESULTADO: {reviews_saved} salvos, {reviews_skipped} duplicatas, {reviews_errors} erros")
+        log.info("📊 RESULTADO: %s salvos, %s duplicatas, %s erros", reviews_saved, reviews_skipped, reviews_errors, extra={"mode": mode, "timings_ms": timings})
         return result
         
     except Exception as e:
         error_msg = f"Erro crítico no webhook: {str(e)}"
-        print(f"❌ {error_msg}")
+        log.error("❌ %s", error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
 # Endpoint para listar leads
@@ -629,23 +793,38 @@ async def receive_reviews_webhook(webhook_data: ReviewWebhook):
 async def get_leads(
     status: Optional[str] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """
     Lista leads com filtros opcionais
+    
+    Paginação por offset (com total) ou por cursor: passe o next_cursor da
+    resposta anterior para continuar sem OFFSET; nesse modo o total é
+    substituído por "remaining" (leads a partir do cursor)
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        keyset = None
+        if cursor:
+            try:
+                keyset = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         
-        if not supabase_url or not supabase_key:
+        if not supabase.configured:
             # Fallback para MongoDB
             query = {}
             if status:
                 query["status"] = status
             
-            contacts = await db.contacts.find(query).sort("created_at", -1).skip(offset).limit(limit).to_list(length=None)
-            total = await db.contacts.count_documents(query)
+            if keyset:
+                query.update(keyset_mongo_filter(keyset))
+                contacts = await db.contacts.find(query).sort([("created_at", -1), ("id", -1)]).limit(limit).to_list(length=None)
+                # Restantes a partir do cursor: contagem no intervalo do índice
+                total = await db.contacts.count_documents(query)
+            else:
+                contacts = await db.contacts.find(query).sort([("created_at", -1), ("id", -1)]).skip(offset).limit(limit).to_list(length=None)
+                total = await lead_counts.count(db.contacts, status)
             
             # Converter para formato padrão
             leads = []
@@ -655,69 +834,184 @@ async def get_leads(
             
             return {
                 "leads": leads,
-                "total": total,
-                "offset": offset,
-                "limit": limit
+                "total": None if keyset else total,
+                "remaining": total if keyset else None,
+                "offset": None if keyset else offset,
+                "limit": limit,
+                "next_cursor": next_cursor(leads, limit)
             }
         
-        # Usar Supabase
-        async with httpx.AsyncClient() as client:
-            # Construir query string
-            params = {
-                "select": "*",
-                "order": "created_at.desc",
-                "offset": offset,
-                "limit": limit
+        # Usar Supabase: página e total (Content-Range) na mesma requisição
+        params = {
+            "select": "*",
+            "order": "created_at.desc,id.desc",
+            "limit": limit
+        }
+        
+        if status:
+            params["status"] = f"eq.{status}"
+        
+        if keyset:
+            params["or"] = keyset_filter(keyset)
+        else:
+            params["offset"] = offset
+        
+        response = await supabase.get(
+            "leads",
+            params=params,
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "count=exact"
             }
+        )
+        
+        # 206 quando a página é parte do total; 416 quando o offset passou do fim
+        # (página vazia, com o total em "*/N")
+        if response.status_code in [200, 206, 416]:
+            leads = response.json() if response.status_code != 416 else []
             
-            if status:
-                params["status"] = f"eq.{status}"
-            
-            query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-            url = f"{supabase_url}/rest/v1/leads?{query_string}"
-            
-            response = await client.get(
-                url,
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}",
-                    "Content-Type": "application/json"
-                }
-            )
+            # O total (já com o filtro de status) vem no header Content-Range
+            total = parse_content_range(response.headers.get("content-range", "")) or 0
             
-            if response.status_code == 200:
-                leads = response.json()
-                
-                # Buscar total de registros
-                count_response = await client.get(
-                    f"{supabase_url}/rest/v1/leads?select=count",
-                    headers={
-                        "apikey": supabase_key,
-                        "Authorization": f"Bearer {supabase_key}",
-                        "Content-Type": "application/json",
-                        "Prefer": "count=exact"
-                    }
-                )
-                
-                total = 0
-                if count_response.status_code == 200:
-                    # O total vem no header Content-Range
-                    content_range = count_response.headers.get("content-range", "")
-                    if "/" in content_range:
-                        total = int(content_range.split("/")[-1])
-                
-                return {
-                    "leads": leads,
-                    "total": total,
-                    "offset": offset,
-                    "limit": limit
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to fetch leads from Supabase")
-                
+            return {
+                "leads": leads,
+                "total": None if keyset else total,
+                "remaining": total if keyset else None,
+                "offset": None if keyset else offset,
+                "limit": limit,
+                "next_cursor": next_cursor(leads, limit)
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to fetch leads from Supabase")
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching leads: {str(e)}")
 
+# Exportação de leads em streaming (CSV ou NDJSON)
+@app.get("/api/leads/export")
+async def export_leads(
+    export_format: str = Query("csv", alias="format"),
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    page_size: int = 500
+):
+    """
+    Exporta todos os leads do filtro (status e intervalo de created_at,
+    created_from inclusivo, created_to exclusivo), do mais novo ao mais antigo
+    
+    Páginas keyset no Supabase ou um cursor no MongoDB: a memória usada não
+    depende do número de leads, e cada página é enviada assim que chega
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    page_size = max(1, min(page_size, 1000))
+    
+    try:
+        if not supabase.configured:
+            # Fallback para MongoDB
+            pages = mongo_lead_pages(db.contacts, status, created_from, created_to, page_size)
+        else:
+            pages = supabase_lead_pages(supabase, status, created_from, created_to, page_size)
+        
+        # Primeira página antes de começar a resposta: falhas aqui ainda viram 500
+        try:
+            first_page = await pages.__anext__()
+        except StopAsyncIteration:
+            first_page = []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting leads: {str(e)}")
+    
+    filename = f"leads-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return StreamingResponse(
+        export_chunks(first_page, pages, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": NO_STORE}
+    )
+
+def build_lead_update(lead_update: LeadUpdate) -> dict:
+    """Campos a gravar; mudança de status registra contacted_at/converted_at"""
+    update_data = {}
+    if lead_update.status:
+        update_data["status"] = lead_update.status
+        if lead_update.status == "contacted":
+            update_data["contacted_at"] = datetime.utcnow().isoformat()
+        elif lead_update.status == "converted":
+            update_data["converted_at"] = datetime.utcnow().isoformat()
+    
+    if lead_update.notes:
+        update_data["notes"] = lead_update.notes
+        
+    if lead_update.assigned_to:
+        update_data["assigned_to"] = lead_update.assigned_to
+    return update_data
+
+def resolve_bulk_target(request: LeadBulkDelete):
+    """IDs ou filtros da requisição em lote (400 se nenhum ou ambos)"""
+    ids = [str(lead_id) for lead_id in (request.ids or [])]
+    try:
+        filters = validate_filters(request.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if bool(ids) == bool(filters):
+        raise HTTPException(status_code=400, detail="Provide either ids or filters")
+    return ids, filters
+
+def bulk_summary(results: List[dict], status: str) -> dict:
+    affected = sum(1 for item in results if item["status"] == status)
+    return {
+        "success": True,
+        f"{status}_count": affected,
+        "not_found_count": len(results) - affected,
+        "results": results
+    }
+
+# Endpoint para atualizar leads em lote
+@app.post("/api/leads/bulk/update")
+async def bulk_update_leads(request: LeadBulkUpdate):
+    """
+    Atualiza vários leads numa única operação (lista de IDs ou filtros)
+    Retorna o resultado de cada lead: updated ou not_found
+    """
+    ids, filters = resolve_bulk_target(request)
+    update_data = build_lead_update(request.update)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    try:
+        if not supabase.configured:
+            # Fallback MongoDB
+            results = await bulk_update_mongo(db.contacts, ids, filters, update_data)
+            if "status" in update_data:
+                lead_counts.invalidate()
+        else:
+            results = await bulk_update_supabase(supabase, ids, filters, update_data)
+        return bulk_summary(results, "updated")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating leads: {str(e)}")
+
+# Endpoint para deletar leads em lote
+@app.post("/api/leads/bulk/delete")
+async def bulk_delete_leads(request: LeadBulkDelete):
+    """
+    Deleta vários leads numa única operação (lista de IDs ou filtros)
+    Retorna o resultado de cada lead: deleted ou not_found
+    """
+    ids, filters = resolve_bulk_target(request)
+    
+    try:
+        if not supabase.configured:
+            # Fallback MongoDB
+            results = await bulk_delete_mongo(db.contacts, ids, filters)
+            lead_counts.invalidate()
+        else:
+            results = await bulk_delete_supabase(supabase, ids, filters)
+        return bulk_summary(results, "deleted")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting leads: {str(e)}")
+
 # Endpoint para atualizar lead
 @app.put("/api/leads/{lead_id}")
 async def update_lead(lead_id: str, lead_update: LeadUpdate):
@@ -725,57 +1019,45 @@ async def update_lead(lead_id: str, lead_update: LeadUpdate):
     Atualiza status, notas e responsável de um lead
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
-        update_data = {}
-        if lead_update.status:
-            update_data["status"] = lead_update.status
-            if lead_update.status == "contacted":
-                update_data["contacted_at"] = datetime.utcnow().isoformat()
-            elif lead_update.status == "converted":
-                update_data["converted_at"] = datetime.utcnow().isoformat()
-        
-        if lead_update.notes:
-            update_data["notes"] = lead_update.notes
-            
-        if lead_update.assigned_to:
-            update_data["assigned_to"] = lead_update.assigned_to
+        update_data = build_lead_update(lead_update)
         
         if not update_data:
             raise HTTPException(status_code=400, detail="No fields to update")
         
-        if not supabase_url or not supabase_key:
+        if not supabase.configured:
             # Fallback MongoDB
-            result = await db.contacts.update_one(
+            # Documento anterior (só o status) para ajustar os totais por status
+            previous = await db.contacts.find_one_and_update(
                 {"id": lead_id},
-                {"$set": update_data}
+                {"$set": update_data},
+                projection={"_id": 0, "status": 1}
             )
             
-            if result.matched_count == 0:
+            if previous is None:
                 raise HTTPException(status_code=404, detail="Lead not found")
             
+            if "status" in update_data:
+                lead_counts.record_status_change(previous.get("status"), update_data["status"])
+            
             return {"success": True, "message": "Lead updated successfully"}
         
         # Usar Supabase
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                f"{supabase_url}/rest/v1/leads?id=eq.{lead_id}",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}",
-                    "Content-Type": "application/json",
-                    "Prefer": "return=representation"
-                },
-                json=update_data
-            )
-            
-            if response.status_code == 200:
-                return {"success": True, "message": "Lead updated successfully"}
-            elif response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Lead not found")
-            else:
-                raise HTTPException(status_code=500, detail="Failed to update lead")
+        response = await supabase.patch(
+            "leads",
+            params={"id": f"eq.{lead_id}"},
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "return=representation"
+            },
+            json=update_data
+        )
+        
+        if response.status_code == 200:
+            return {"success": True, "message": "Lead updated successfully"}
+        elif response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Lead not found")
+        else:
+            raise HTTPException(status_code=500, detail="Failed to update lead")
                 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating lead: {str(e)}")
@@ -787,35 +1069,30 @@ async def delete_lead(lead_id: str):
     Deleta um lead específico
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
-        if not supabase_url or not supabase_key:
+        if not supabase.configured:
             # Fallback MongoDB
-            result = await db.contacts.delete_one({"id": lead_id})
+            deleted = await db.contacts.find_one_and_delete({"id": lead_id}, projection={"_id": 0, "status": 1})
             
-            if result.deleted_count == 0:
+            if deleted is None:
                 raise HTTPException(status_code=404, detail="Lead not found")
             
+            lead_counts.record_delete(deleted.get("status"))
+            
             return {"success": True, "message": "Lead deleted successfully"}
         
         # Usar Supabase
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{supabase_url}/rest/v1/leads?id=eq.{lead_id}",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}",
-                    "Content-Type": "application/json"
-                }
-            )
-            
-            if response.status_code == 204:
-                return {"success": True, "message": "Lead deleted successfully"}
-            elif response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Lead not found")
-            else:
-                raise HTTPException(status_code=500, detail="Failed to delete lead")
+        response = await supabase.delete(
+            "leads",
+            params={"id": f"eq.{lead_id}"},
+            headers={"Content-Type": "application/json"}
+        )
+        
+        if response.status_code == 204:
+            return {"success": True, "message": "Lead deleted successfully"}
+        elif response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Lead not found")
+        else:
+            raise HTTPException(status_code=500, detail="Failed to delete lead")
                 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting lead: {str(e)}")
@@ -827,9 +1104,6 @@ async def cleanup_demo_leads():
     Remove todos os leads de demonstração/teste
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
         # Lista de leads demo para remover
         demo_names = [
             "João Silva",
@@ -854,60 +1128,16 @@ async def cleanup_demo_leads():
             "webhook_test"
         ]
         
-        if not supabase_url or not supabase_key:
+        filters = {"name": demo_names, "email": demo_emails, "source": demo_sources}
+        if not supabase.configured:
             # Fallback MongoDB
-            query = {
-                "$or": [
-                    {"name": {"$in": demo_names}},
-                    {"email": {"$in": demo_emails}},
-                    {"source": {"$in": demo_sources}}
-                ]
-            }
-            result = await db.contacts.delete_many(query)
-            deleted_count = result.deleted_count
+            results = await bulk_delete_mongo(db.contacts, [], filters)
+            lead_counts.invalidate()
         else:
-            # Usar Supabase
-            deleted_count = 0
-            async with httpx.AsyncClient() as client:
-                # Deletar por nome
-                for name in demo_names:
-                    response = await client.delete(
-                        f"{supabase_url}/rest/v1/leads?name=eq.{name}",
-                        headers={
-                            "apikey": supabase_key,
-                            "Authorization": f"Bearer {supabase_key}",
-                            "Content-Type": "application/json"
-                        }
-                    )
-                    if response.status_code == 204:
-                        deleted_count += 1
-                
-                # Deletar por email
-                for email in demo_emails:
-                    response = await client.delete(
-                        f"{supabase_url}/rest/v1/leads?email=eq.{email}",
-                        headers={
-                            "apikey": supabase_key,
-                            "Authorization": f"Bearer {supabase_key}",
-                            "Content-Type": "application/json"
-                        }
-                    )
-                    if response.status_code == 204:
-                        deleted_count += 1
-                
-                # Deletar por source
-                for source in demo_sources:
-                    response = await client.delete(
-                        f"{supabase_url}/rest/v1/leads?source=eq.{source}",
-                        headers={
-                            "apikey": supabase_key,
-                            "Authorization": f"Bearer {supabase_key}",
-                            "Content-Type": "application/json"
-                        }
-                    )
-                    if response.status_code == 204:
-                        deleted_count += 1
-        
+            # Usar Supabase: um único DELETE com or=(name.in.(...),email.in.(...),source.in.(...))
+            results = await bulk_delete_supabase(supabase, [], filters)
+        deleted_count = len(results)
+    
         return {
             "success": True,
             "message": f"Demo leads cleanup completed",
@@ -919,157 +1149,293 @@ async def cleanup_demo_leads():
 
 # Endpoint para verificar reviews duplicados no Supabase
 @app.get("/api/reviews/check-duplicates")
-async def check_duplicates():
+async def check_duplicates(stream: bool = False, page_size: int = 500):
     """
     Verifica reviews duplicados no Supabase
     Retorna estatísticas de duplicatas por review_id e por conteúdo
+    
+    stream=true: varre a tabela paginada e envia cada duplicata como NDJSON
+    assim que encontrada, terminando com uma linha "summary"
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
-        if not supabase_url or not supabase_key:
+        if not supabase.configured:
             return {
                 "error": "Supabase não configurado",
                 "message": "Configure SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY no .env"
             }
         
-        async with httpx.AsyncClient(timeout=30) as client:
-            # Buscar todos os reviews ativos
-            print("🔍 Buscando todos os reviews do Supabase...")
-            response = await client.get(
-                f"{supabase_url}/rest/v1/google_reviews",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}"
-                },
-                params={
-                    "select": "id,review_id,author_name,text,rating,review_time,review_timestamp,is_active",
-                    "is_active": "eq.true",
-                    "order": "review_time.desc"
-                }
-            )
+        if stream:
+            # Acima do max-rows do PostgREST (1000) as páginas viriam cortadas
+            page_size = max(1, min(page_size, 1000))
             
-            if response.status_code != 200:
-                return {
-                    "error": f"Erro ao buscar reviews: {response.status_code}",
-                    "details": response.text
-                }
-            
-            reviews = response.json()
-            total_reviews = len(reviews)
-            print(f"📊 Total de reviews encontrados: {total_reviews}")
-            
-            # Verificar duplicatas por review_id
-            review_ids_dict = {}
-            duplicates_by_id = []
-            
-            for review in reviews:
-                review_id = review.get("review_id")
-                if review_id:
-                    if review_id in review_ids_dict:
-                        # Duplicata encontrada
-                        existing = review_ids_dict[review_id]
-                        duplicates_by_id.append({
-                            "review_id": review_id,
-                            "author": review.get("author_name"),
-                            "rating": review.get("rating"),
-                            "text_preview": review.get("text", "")[:100] + "..." if len(review.get("text", "")) > 100 else review.get("text", ""),
-                            "duplicate_1": {
-                                "id": existing["id"],
-                                "review_time": existing.get("review_time"),
-                                "review_timestamp": existing.get("review_timestamp")
-                            },
-                            "duplicate_2": {
-                                "id": review["id"],
-                                "review_time": review.get("review_time"),
-                                "review_timestamp": review.get("review_timestamp")
-                            }
-                        })
-                    else:
-                        review_ids_dict[review_id] = review
-            
-            # Verificar duplicatas por conteúdo (mesmo autor + texto similar)
-            import hashlib
-            content_hashes = {}
-            duplicates_by_content = []
+            async def ndjson_lines():
+                try:
+                    async for event in scan_duplicates(supabase, page_size=page_size):
+                        yield dumps(event) + b"\n"
+                except Exception as e:
+                    # Status 200 já foi enviado: o stream termina com uma linha de erro
+                    log.error("❌ Verificação de duplicatas interrompida: %s", e)
+                    yield dumps({"type": "error", "error": str(e)}) + b"\n"
             
-            for review in reviews:
-                # Criar hash do conteúdo para comparação
-                author = review.get("author_name", "").strip().lower()
-                text = review.get("text", "").strip()
-                rating = review.get("rating", 0)
-                
-                # Normalizar texto (remover espaços extras, converter para minúsculas)
-                text_normalized = " ".join(text.lower().split())
-                
-                # Criar chave única baseada em autor, rating e hash do texto
-                text_hash = hashlib.md5(text_normalized.encode()).hexdigest()[:12]
-                content_key = f"{author}_{rating}_{text_hash}"
-                
-                if content_key in content_hashes:
-                    existing = content_hashes[content_key]
-                    # Verificar se o texto é realmente similar (pode ter pequenas diferenças)
-                    if text_normalized == existing["text_normalized"]:
-                        duplicates_by_content.append({
-                            "author": review.get("author_name"),
-                            "rating": rating,
-                            "text_preview": text[:100] + "..." if len(text) > 100 else text,
-                            "duplicate_1": {
-                                "id": existing["id"],
-                                "review_id": existing.get("review_id"),
-                                "review_time": existing.get("review_time")
-                            },
-                            "duplicate_2": {
-                                "id": review["id"],
-                                "review_id": review.get("review_id"),
-                                "review_time": review.get("review_time")
-                            }
-                        })
+            return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+        
+        # Buscar todos os reviews ativos
+        log.info("🔍 Buscando todos os reviews do Supabase...")
+        response = await supabase.get(
+            "google_reviews",
+            timeout=30,
+            params={
+                "select": "id,review_id,author_name,text,rating,review_time,review_timestamp,is_active,content_hash",
+                "is_active": "eq.true",
+                "order": "review_time.desc"
+            }
+        )
+        
+        if response.status_code != 200:
+            return {
+                "error": f"Erro ao buscar reviews: {response.status_code}",
+                "details": response.text
+            }
+        
+        reviews = response.json()
+        total_reviews = len(reviews)
+        log.info("📊 Total de reviews encontrados: %s", total_reviews)
+        
+        # Verificar duplicatas por review_id
+        review_ids_dict = {}
+        duplicates_by_id = []
+        
+        for review in reviews:
+            review_id = review.get("review_id")
+            if review_id:
+                if review_id in review_ids_dict:
+                    # Duplicata encontrada
+                    existing = review_ids_dict[review_id]
+                    duplicates_by_id.append({
+                        "review_id": review_id,
+                        "author": review.get("author_name"),
+                        "rating": review.get("rating"),
+                        "text_preview": review.get("text", "")[:100] + "..." if len(review.get("text", "")) > 100 else review.get("text", ""),
+                        "duplicate_1": {
+                            "id": existing["id"],
+                            "review_time": existing.get("review_time"),
+                            "review_timestamp": existing.get("review_timestamp")
+                        },
+                        "duplicate_2": {
+                            "id": review["id"],
+                            "review_time": review.get("review_time"),
+                            "review_timestamp": review.get("review_timestamp")
+                        }
+                    })
                 else:
-                    content_hashes[content_key] = {
+                    review_ids_dict[review_id] = review
+        
+        # Verificar duplicatas por conteúdo (mesmo autor + rating + texto normalizado)
+        content_hashes = {}
+        duplicates_by_content = []
+        
+        for review in reviews:
+            # Hash gravado na ingestão (ou calculado para linhas antigas)
+            review_hash = row_content_hash(review)
+            text = review.get("text", "").strip()
+            
+            if review_hash in content_hashes:
+                existing = content_hashes[review_hash]
+                duplicates_by_content.append({
+                    "author": review.get("author_name"),
+                    "rating": review.get("rating", 0),
+                    "text_preview": text[:100] + "..." if len(text) > 100 else text,
+                    "duplicate_1": {
+                        "id": existing["id"],
+                        "review_id": existing.get("review_id"),
+                        "review_time": existing.get("review_time")
+                    },
+                    "duplicate_2": {
                         "id": review["id"],
                         "review_id": review.get("review_id"),
-                        "text_normalized": text_normalized,
                         "review_time": review.get("review_time")
                     }
-            
-            # Contar reviews únicos
-            unique_by_id = len(review_ids_dict)
-            unique_by_content = len(content_hashes)
-            
-            result = {
-                "summary": {
-                    "total_reviews": total_reviews,
-                    "unique_by_review_id": unique_by_id,
-                    "unique_by_content": unique_by_content,
-                    "duplicates_by_review_id": len(duplicates_by_id),
-                    "duplicates_by_content": len(duplicates_by_content),
-                    "total_duplicate_groups": len(duplicates_by_id) + len(duplicates_by_content)
-                },
-                "duplicates_by_review_id": duplicates_by_id[:50],  # Limitar a 50 para não sobrecarregar
-                "duplicates_by_content": duplicates_by_content[:50],
-                "recommendation": "Verifique os duplicados acima e considere limpar mantendo apenas o mais recente"
-            }
-            
-            print(f"✅ Verificação concluída:")
-            print(f"   - Total: {total_reviews}")
-            print(f"   - Únicos por review_id: {unique_by_id}")
-            print(f"   - Duplicados por review_id: {len(duplicates_by_id)}")
-            print(f"   - Duplicados por conteúdo: {len(duplicates_by_content)}")
-            
-            return result
-            
+                })
+            else:
+                content_hashes[review_hash] = {
+                    "id": review["id"],
+                    "review_id": review.get("review_id"),
+                    "review_time": review.get("review_time")
+                }
+        
+        # Contar reviews únicos
+        unique_by_id = len(review_ids_dict)
+        unique_by_content = len(content_hashes)
+        
+        result = {
+            "summary": {
+                "total_reviews": total_reviews,
+                "unique_by_review_id": unique_by_id,
+                "unique_by_content": unique_by_content,
+                "duplicates_by_review_id": len(duplicates_by_id),
+                "duplicates_by_content": len(duplicates_by_content),
+                "total_duplicate_groups": len(duplicates_by_id) + len(duplicates_by_content)
+            },
+            "duplicates_by_review_id": duplicates_by_id[:50],  # Limitar a 50 para não sobrecarregar
+            "duplicates_by_content": duplicates_by_content[:50],
+            "recommendation": "Verifique os duplicados acima e considere limpar mantendo apenas o mais recente"
+        }
+        
+        log.info("✅ Verificação concluída: %s reviews, %s únicos por review_id, %s duplicados por review_id, %s duplicados por conteúdo", total_reviews, unique_by_id, len(duplicates_by_id), len(duplicates_by_content))
+        
+        return result
+        
     except Exception as e:
         error_msg = f"Erro ao verificar duplicatas: {str(e)}"
-        print(f"❌ {error_msg}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ %s", error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
+# Endpoint para preencher content_hash de reviews antigos
+@app.post("/api/reviews/content-hash/backfill")
+async def backfill_content_hash(batch_size: int = 200):
+    """
+    Calcula content_hash para reviews gravados antes da coluna existir
+    Usa a mesma normalização da ingestão (review_dedup), então o índice
+    passa a cobrir também as linhas antigas
+    """
+    if not supabase.configured:
+        raise HTTPException(status_code=400, detail="Supabase não configurado")
+    
+    try:
+        updated = 0
+        errors = 0
+        last_id = 0
+        while True:
+            # Paginação por id: linhas com erro não são buscadas de novo
+            response = await supabase.get(
+                "google_reviews",
+                timeout=30,
+                params={
+                    "select": "id,author_name,rating,text",
+                    "content_hash": "is.null",
+                    "id": f"gt.{last_id}",
+                    "order": "id.asc",
+                    "limit": str(batch_size)
+                }
+            )
+            if response.status_code != 200:
+                raise Exception(f"Supabase respondeu {response.status_code}")
+            
+            rows = response.json()
+            if not rows:
+                break
+            
+            # Um upsert por página: o conflito no id atualiza só content_hash das linhas existentes
+            upsert_response = await supabase.post(
+                "google_reviews",
+                params={"on_conflict": "id"},
+                headers={"Content-Type": "application/json", "Prefer": "return=minimal,resolution=merge-duplicates"},
+                json=[
+                    {"id": row["id"], "content_hash": content_hash(row.get("author_name"), row.get("rating", 0), row.get("text"))}
+                    for row in rows
+                ]
+            )
+            if upsert_response.status_code in [200, 201, 204]:
+                updated += len(rows)
+            else:
+                errors += len(rows)
+                log.error("❌ Erro preenchendo content_hash (ids %s-%s): %s", rows[0]["id"], rows[-1]["id"], upsert_response.status_code)
+            last_id = rows[-1]["id"]
+        
+        log.info("✅ content_hash preenchido em %s reviews (%s erros)", updated, errors)
+        return {"success": True, "updated": updated, "errors": errors}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error backfilling content_hash: {str(e)}")
+
 # Initialize default service types
+# Campos lidos só na inicialização: mudar exige reiniciar o servidor
+RESTART_ONLY_SETTINGS = ("mongo_url", "services_catalog_change_stream", "reviews_sync_enabled", "read_replica_enabled", "read_replica_path", "contact_write_mode", "contact_spool_path", "log_format", "log_queue_size")
+
+# Sinks e fila das notificações também são montados só na inicialização
+RESTART_ONLY_SETTINGS += tuple(name for name in Settings.model_fields if name.startswith("notify_"))
+
+async def apply_reloaded_settings(old, new):
+    """Aplica a configuração recarregada (SIGHUP) aos componentes já criados"""
+    await supabase.apply_settings(new)
+    backends["supabase"].enabled = supabase.configured
+    for breaker in backends.breakers.values():
+        breaker.set_window(new.breaker_window)
+        breaker.min_calls = new.breaker_min_calls
+        breaker.failure_rate = new.breaker_failure_rate
+        breaker.open_seconds = new.breaker_open_seconds
+    backends.probe_interval = new.breaker_probe_interval
+    reviews_cache.ttl = new.reviews_cache_ttl
+    reviews_cache.stale_ttl = new.reviews_cache_stale_ttl
+    review_sync.interval = new.reviews_sync_interval
+    review_sync.full_interval = new.reviews_sync_full_interval
+    lead_counts.resync_seconds = new.lead_count_resync_seconds
+    idempotency_store.ttl = new.idempotency_window
+    idempotency_store.max_entries = new.idempotency_max_entries
+    service_catalog.poll_interval = new.services_catalog_poll_interval
+    if contact_spool is not None:
+        contact_spool.batch_size = new.contact_spool_batch_size
+        contact_spool.poll_interval = new.contact_spool_poll_interval
+        contact_spool.base_backoff = new.contact_spool_backoff
+        contact_spool.max_backoff = new.contact_spool_max_backoff
+        contact_spool.max_attempts = new.contact_spool_max_attempts
+    apply_logging_settings(new)
+    
+    pending = [name for name in RESTART_ONLY_SETTINGS if getattr(old, name) != getattr(new, name)]
+    if pending:
+        log.warning("⚠️ Configurações que só valem após reiniciar: %s", ", ".join(pending))
+
+on_reload(apply_reloaded_settings)
+
+async def handle_sighup():
+    try:
+        await reload_settings()
+        log.info("🔄 Configuração recarregada (SIGHUP)")
+    except Exception as e:
+        log.error("❌ Configuração inválida, mantendo a atual: %s", e)
+
+mongo_index_task: Optional[asyncio.Task] = None
+
+async def prepare_mongo_indexes():
+    try:
+        await ensure_indexes(db)
+        await check_query_plans(db)
+    except Exception as e:
+        log.warning("⚠️ Índices do MongoDB não verificados: %s", e)
+
 @app.on_event("startup")
 async def startup_event():
+    # Abrir pool de conexões do Supabase
+    await supabase.start()
+    
+    # kill -HUP <pid> relê .env/ambiente (ex.: rotação da chave do Supabase) sem reiniciar
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(handle_sighup()))
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass  # Windows ou fora da thread principal
+    
+    # Probe periódico dos backends com circuito em half_open
+    backends.start({
+        "supabase": lambda: supabase.ping("leads"),
+        "mongo": lambda: db.command("ping"),
+    })
+    
+    # Workers das notificações de novos leads
+    notifications.start()
+    
+    # Sincronização dos reviews em background (a primeira carga completa roda na task)
+    # Até ela terminar, os endpoints respondem com o snapshot salvo na réplica local
+    if REVIEWS_SYNC_ENABLED and supabase.configured:
+        try:
+            await review_sync.load_replica()
+        except Exception as e:
+            log.warning("⚠️ Réplica local de reviews não lida: %s", e)
+        review_sync.start()
+    
+    # Worker da fila de contatos (modo spool): entrega também o que ficou de execuções anteriores
+    if contact_spool is not None:
+        contact_spool.start(deliver_spooled_leads)
+    
     # Check if service types exist, if not create defaults
     try:
         count = await db.service_types.count_documents({})
@@ -1108,9 +1474,50 @@ async def startup_event():
             ]
             
             await db.service_types.insert_many(default_services)
-            print("Default service types initialized with updated prices (+15%)")
+            log.info("Default service types initialized with updated prices (+15%%)")
     except Exception as e:
-        print(f"⚠️ MongoDB not available: {e}. API de reviews continuará funcionando via Supabase.")
+        log.warning("⚠️ MongoDB not available: %s. API de reviews continuará funcionando via Supabase.", e)
+    
+    # Índices do fallback MongoDB + aviso de consultas que fariam collection scan
+    # Em background: com o MongoDB fora, o startup não espera os timeouts
+    global mongo_index_task
+    if get_settings().mongo_ensure_indexes:
+        mongo_index_task = asyncio.create_task(prepare_mongo_indexes())
+    
+    # Catálogo de serviços em memória (se o MongoDB estiver fora, carrega quando voltar)
+    try:
+        await service_catalog.load_replica()
+    except Exception as e:
+        log.warning("⚠️ Réplica local do catálogo de serviços não lida: %s", e)
+    try:
+        await service_catalog.refresh(db.service_types)
+    except Exception as e:
+        log.warning("⚠️ Catálogo de serviços não carregado: %s", e)
+    service_catalog.start(db.service_types)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Parar o worker da fila de contatos (uma última drenagem antes de fechar o pool)
+    if contact_spool is not None:
+        await contact_spool.close(deliver_spooled_leads)
+    
+    if mongo_index_task is not None and not mongo_index_task.done():
+        mongo_index_task.cancel()
+    
+    await backends.close()
+    await service_catalog.close()
+    await review_sync.close()
+    if read_replica is not None:
+        read_replica.close()
+    
+    # Entregar notificações pendentes
+    await notifications.close()
+    
+    # Fechar pool de conexões do Supabase
+    await supabase.close()
+    
+    # Escrever os logs que ainda estão na fila
+    shutdown_logging()
 
 if __name__ == "__main__":
     import uvicorn
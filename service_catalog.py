@@ -0,0 +1,161 @@
+"""
+Catálogo de serviços em memória para /api/services
+
+O catálogo (service_types no MongoDB) é criado no startup e quase nunca
+muda. Ele é carregado uma vez para a memória e servido dali, já codificado
+(RenderedJSON), com um `version` = hash do conteúdo. Se o MongoDB cair, a
+última versão carregada continua sendo servida.
+
+Atualização em background:
+- change stream (db.service_types.watch()), quando o MongoDB é replica set
+- polling a cada `poll_interval` segundos caso contrário, e também para
+  recuperar mudanças perdidas enquanto o change stream estava fora
+Uma atualização só troca o catálogo se o conteúdo mudou.
+
+Com uma réplica local (read_replica), cada versão nova é gravada no arquivo
+SQLite e load_replica() a restaura no startup, antes do MongoDB responder.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Optional
+
+from pymongo.errors import OperationFailure
+
+from fast_json import dumps
+from http_caching import RenderedJSON
+from structured_logging import get_logger
+
+log = get_logger("service_catalog")
+
+
+class ServiceCatalog:
+    def __init__(self, poll_interval: float = 60.0, use_change_stream: bool = True, replica=None):
+        self.poll_interval = poll_interval
+        self.use_change_stream = use_change_stream
+        self.replica = replica
+
+        self._collection = None
+        self._rendered: Optional[RenderedJSON] = None
+        self._lock = asyncio.Lock()
+        self._worker: Optional[asyncio.Task] = None
+
+        self.version: Optional[str] = None
+        self.count = 0
+        self.mode = "stopped"
+        self.loaded_at: Optional[float] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._rendered is not None
+
+    async def refresh(self, collection=None) -> bool:
+        """
+        Recarrega o catálogo do MongoDB; retorna True se o conteúdo mudou
+        Levanta exceção se o MongoDB falhar (o catálogo atual é mantido)
+        """
+        collection = collection if collection is not None else self._collection
+        async with self._lock:
+            self.refreshes += 1
+            try:
+                services = await collection.find({"active": True}, {"_id": 0}).to_list(length=None)
+            except Exception as e:
+                self.refresh_errors += 1
+                self.last_error = str(e)[:200]
+                raise
+
+            version = hashlib.blake2b(dumps(services), digest_size=8).hexdigest()
+            self.loaded_at = time.time()
+            if version == self.version:
+                return False
+
+            self._rendered = RenderedJSON({"services": services, "version": version})
+            self.version = version
+            self.count = len(services)
+            log.info("📋 Catálogo de serviços carregado: %s serviços (versão %s)", len(services), version)
+            if self.replica is not None:
+                try:
+                    await asyncio.to_thread(self.replica.replace_services, services, version)
+                except Exception as e:
+                    log.warning("⚠️ Réplica local do catálogo de serviços não atualizada: %s", e)
+            return True
+
+    async def load_replica(self) -> bool:
+        """Restaura o catálogo da réplica local (startup); True se havia serviços"""
+        if self.replica is None or self.loaded:
+            return False
+        services, version = await asyncio.to_thread(self.replica.load_services)
+        if not services:
+            return False
+        async with self._lock:
+            self._rendered = RenderedJSON({"services": services, "version": version})
+            self.version = version
+            self.count = len(services)
+        log.info("💾 Catálogo de serviços restaurado da réplica local: %s serviços (versão %s)", len(services), version)
+        return True
+
+    async def get(self) -> RenderedJSON:
+        """Catálogo atual; se ainda não foi carregado, tenta carregar agora"""
+        if self._rendered is None:
+            await self.refresh()
+        return self._rendered
+
+    # ---- atualização em background ----
+
+    def start(self, collection):
+        self._collection = collection
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        use_stream = self.use_change_stream
+        while True:
+            if use_stream:
+                try:
+                    await self._watch()
+                except OperationFailure as e:
+                    # MongoDB standalone: change streams exigem replica set
+                    log.info("ℹ️ Change stream indisponível (%s), catálogo de serviços via polling", e)
+                    use_stream = False
+                except Exception as e:
+                    log.warning("⚠️ Change stream do catálogo de serviços caiu: %s", e)
+
+            self.mode = "poll"
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.warning("⚠️ Falha ao atualizar catálogo de serviços, mantendo versão %s: %s", self.version, e)
+
+    async def _watch(self):
+        async with self._collection.watch() as stream:
+            self.mode = "change_stream"
+            # Mudanças feitas antes do stream abrir
+            await self.refresh()
+            async for _ in stream:
+                await self.refresh()
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self.mode = "stopped"
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "version": self.version,
+            "services": self.count,
+            "mode": self.mode,
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,209 @@
+"""
+Configuração tipada do backend FastAPI
+
+Lida e validada uma vez no startup (variáveis de ambiente / .env). Cada
+variável é o nome do campo em maiúsculas (supabase_url -> SUPABASE_URL).
+Valores derivados, como a URL do PostgREST e os headers de autenticação,
+são calculados uma vez aqui em vez de a cada request.
+
+reload_settings() relê o .env e o ambiente (usado no SIGHUP para trocar a
+chave do Supabase sem reiniciar). Se a nova configuração for inválida, a
+atual continua valendo.
+"""
+import os
+from typing import Callable, List, Literal, Optional
+
+from dotenv import dotenv_values, load_dotenv
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator
+
+
+class Settings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    # Supabase
+    supabase_url: str = ""
+    supabase_service_role_key: str = ""
+    supabase_max_connections: int = Field(20, ge=1)
+    supabase_max_keepalive: int = Field(10, ge=0)
+    supabase_keepalive_expiry: float = Field(30.0, ge=0)
+    supabase_timeout: float = Field(10.0, gt=0)
+    supabase_connect_timeout: float = Field(5.0, gt=0)
+    supabase_http2: bool = True
+
+    # MongoDB (fallback)
+    mongo_url: str = "mongodb://localhost:27017"
+    mongo_ensure_indexes: bool = True
+    lead_count_resync_seconds: float = Field(300.0, gt=0)
+
+    # Cache de /api/reviews
+    reviews_cache_ttl: float = Field(300.0, ge=0)
+    reviews_cache_stale_ttl: float = Field(3600.0, ge=0)
+
+    # Snapshot de reviews sincronizado em background (desligado: cache acima, buscando no request)
+    reviews_sync_enabled: bool = True
+    reviews_sync_interval: float = Field(60.0, gt=0)
+    reviews_sync_full_interval: float = Field(3600.0, gt=0)
+
+    # Réplica local (SQLite) de reviews e serviços para cold start sem Supabase/MongoDB
+    read_replica_enabled: bool = True
+    read_replica_path: str = "read_replica.db"
+
+    # Cache-Control das rotas públicas (max-age: navegador, s-maxage: CDN)
+    reviews_cache_control: str = "public, max-age=60, s-maxage=300, stale-while-revalidate=3600"
+    reviews_stats_cache_control: str = "public, max-age=60, s-maxage=300, stale-while-revalidate=3600"
+    services_cache_control: str = "public, max-age=300, s-maxage=3600"
+
+    # Catálogo de serviços em memória (/api/services)
+    services_catalog_poll_interval: float = Field(60.0, gt=0)
+    services_catalog_change_stream: bool = True
+
+    # Webhook de reviews
+    reviews_webhook_mode: Literal["batch", "concurrent", "sequential"] = "batch"
+    reviews_webhook_batch_size: int = Field(100, ge=1)
+    reviews_webhook_concurrency: int = Field(10, ge=1)
+
+    # Formulário de contato
+    contact_write_mode: Literal["sync", "spool"] = "sync"
+    contact_spool_path: str = "contact_spool.db"
+    contact_spool_batch_size: int = Field(50, ge=1)
+    contact_spool_poll_interval: float = Field(5.0, gt=0)
+    contact_spool_backoff: float = Field(2.0, gt=0)
+    contact_spool_max_backoff: float = Field(300.0, gt=0)
+    contact_spool_max_attempts: int = Field(10, ge=1)
+
+    # Notificações de novos leads (sinks sem URL/host ficam desligados)
+    notify_webhook_url: str = ""
+    notify_n8n_webhook_url: str = ""
+    notify_smtp_host: str = ""
+    notify_smtp_port: int = Field(587, ge=1)
+    notify_smtp_username: str = ""
+    notify_smtp_password: str = ""
+    notify_smtp_from: str = ""
+    notify_smtp_to: str = ""
+    notify_smtp_starttls: bool = True
+    notify_queue_size: int = Field(1000, ge=1)
+    notify_batch_size: int = Field(20, ge=1)
+    notify_batch_window: float = Field(5.0, ge=0)
+    notify_workers: int = Field(1, ge=1)
+    notify_retries: int = Field(3, ge=0)
+
+    # Idempotência de /api/contact e /api/bookings
+    idempotency_window: float = Field(600.0, ge=0)
+    idempotency_max_entries: int = Field(10000, ge=1)
+
+    # Circuit breakers
+    breaker_window: int = Field(20, ge=1)
+    breaker_min_calls: int = Field(5, ge=1)
+    breaker_failure_rate: float = Field(0.5, gt=0, le=1)
+    breaker_open_seconds: float = Field(30.0, gt=0)
+    breaker_probe_interval: float = Field(10.0, gt=0)
+
+    # Logs
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
+    log_format: Literal["json", "text"] = "json"
+    log_queue_size: int = Field(10000, ge=1)
+    log_sample_rate: float = Field(1.0, ge=0, le=1)
+    log_sample_routes: str = ""
+
+    _auth_headers: dict = PrivateAttr(default_factory=dict)
+
+    @field_validator("supabase_url")
+    @classmethod
+    def _strip_url(cls, value: str) -> str:
+        return value.strip().rstrip("/")
+
+    @field_validator("reviews_webhook_mode", "contact_write_mode", "log_format", mode="before")
+    @classmethod
+    def _lower(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+    @field_validator("log_level", mode="before")
+    @classmethod
+    def _upper(cls, value):
+        return value.strip().upper() if isinstance(value, str) else value
+
+    def model_post_init(self, __context):
+        self._auth_headers = {
+            "apikey": self.supabase_service_role_key,
+            "Authorization": f"Bearer {self.supabase_service_role_key}",
+        }
+
+    @classmethod
+    def from_env(cls, environ=None) -> "Settings":
+        """Monta a configuração a partir do ambiente; levanta ValidationError se inválida"""
+        environ = os.environ if environ is None else environ
+        values = {
+            name: environ[name.upper()]
+            for name in cls.model_fields
+            if environ.get(name.upper()) not in (None, "")
+        }
+        return cls(**values)
+
+    @property
+    def supabase_configured(self) -> bool:
+        return bool(self.supabase_url and self.supabase_service_role_key)
+
+    @property
+    def supabase_rest_url(self) -> str:
+        return f"{self.supabase_url}/rest/v1"
+
+    @property
+    def supabase_auth_headers(self) -> dict:
+        """Headers apikey/Authorization, calculados uma vez por configuração"""
+        return self._auth_headers
+
+
+_settings: Optional[Settings] = None
+_listeners: List[Callable[[Settings, Settings], object]] = []
+_process_env: frozenset = frozenset()  # variáveis do processo, que valem mais que o .env
+
+
+def get_settings() -> Settings:
+    """Configuração atual (carregada na primeira chamada)"""
+    global _settings, _process_env
+    if _settings is None:
+        _process_env = frozenset(os.environ)
+        load_dotenv()
+        _settings = Settings.from_env()
+    return _settings
+
+
+def on_reload(callback: Callable[[Settings, Settings], object]):
+    """Registra callback(antiga, nova), chamado no reload antes de a nova virar a atual"""
+    _listeners.append(callback)
+
+
+def _reload_environ() -> dict:
+    """
+    .env relido com a mesma precedência do startup (load_dotenv sem override):
+    variável do ambiente do processo vence a do arquivo
+    """
+    environ = {name: value for name, value in dotenv_values().items() if value is not None}
+    environ.update((name, os.environ[name]) for name in _process_env if name in os.environ)
+    return environ
+
+
+async def _notify(old: Settings, new: Settings):
+    for callback in _listeners:
+        result = callback(old, new)
+        if hasattr(result, "__await__"):
+            await result
+
+
+async def reload_settings() -> Settings:
+    """
+    Relê .env e ambiente, valida, aplica aos componentes e troca a configuração atual
+    Levanta exceção (mantendo a configuração atual) se a nova for inválida ou
+    se algum callback falhar; nesse caso os callbacks são chamados de novo com
+    a configuração atual, desfazendo o que já tinha sido aplicado
+    """
+    global _settings
+    new = Settings.from_env(_reload_environ())
+    old = get_settings()
+    try:
+        await _notify(old, new)
+    except Exception:
+        await _notify(new, old)
+        raise
+    _settings = new
+    return new
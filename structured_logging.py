@@ -0,0 +1,227 @@
+"""
+Logging estruturado e não bloqueante
+
+- Registros em JSON (uma linha por evento) ou texto, via LOG_FORMAT
+- O request só coloca o registro numa fila limitada (QueueHandler); uma
+  thread (QueueListener) formata e escreve no stdout. Com a fila cheia o
+  registro é descartado e contado, em vez de travar o event loop
+- Cada request recebe um request_id (header X-Request-ID ou gerado), que
+  aparece em todos os registros emitidos durante aquele request
+- Mensagens repetitivas (uma por review, por lead...) são marcadas com
+  extra=SAMPLED e amostradas por rota (log_sample_routes)
+"""
+import copy
+import json
+import logging
+import queue
+import random
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+ROOT_LOGGER = "santos"
+
+# Marca mensagens repetitivas sujeitas a amostragem: log.info(..., extra=SAMPLED)
+SAMPLED = {"sampled": True}
+
+# Contexto do request atual: request_id e o scope ASGI (para a rota)
+_request_context: ContextVar[Optional[dict]] = ContextVar("request_context", default=None)
+
+# Atributos padrão do LogRecord (o resto vem de extra= e vai para o JSON)
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id", "route", "sampled"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def current_request_id() -> Optional[str]:
+    context = _request_context.get()
+    return context["request_id"] if context else None
+
+
+def _current_route() -> Optional[str]:
+    context = _request_context.get()
+    if not context:
+        return None
+    route = context["scope"].get("route")
+    return getattr(route, "path", None) or context["scope"].get("path")
+
+
+class ContextFilter(logging.Filter):
+    """Anexa request_id e rota ao registro (roda na thread do request)"""
+
+    def filter(self, record):
+        record.request_id = current_request_id()
+        record.route = _current_route()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Amostra registros marcados com SAMPLED conforme a taxa da rota"""
+
+    def __init__(self, default_rate: float = 1.0, route_rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.default_rate = default_rate
+        self.route_rates = route_rates or {}
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        rate = self.route_rates.get(getattr(record, "route", None), self.default_rate)
+        if rate >= 1 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta (e conta) registros quando a fila está cheia"""
+
+    dropped = 0
+
+    def prepare(self, record):
+        """
+        Como QueueHandler.prepare (mensagem já formatada, sem args nem
+        exc_info, que não atravessam a fila), mas o traceback vai para
+        exc_text em vez de ser colado na mensagem: o JsonFormatter o grava
+        no campo exc_info e o TextFormatter o acrescenta ao final
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "route": getattr(record, "route", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        # Traceback preparado pelo DroppingQueueHandler (exc_info não atravessa a fila)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        request_id = getattr(record, "request_id", None)
+        prefix = f"[{request_id[:8]}] " if request_id else ""
+        return f"{prefix}{super().format(record)}"
+
+
+def parse_route_rates(value: str) -> Dict[str, float]:
+    """"/api/webhook/reviews-update=0.1,/api/contact=0.5" -> {rota: taxa}"""
+    rates = {}
+    for item in (value or "").split(","):
+        route, _, rate = item.strip().rpartition("=")
+        if route:
+            rates[route] = float(rate)
+    return rates
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+_sampling: Optional[SamplingFilter] = None
+
+
+def setup_logging(settings):
+    """Configura o logger "santos" a partir da configuração (idempotente)"""
+    global _listener, _queue_handler, _sampling
+    if _queue_handler is not None:
+        return
+
+    stream = logging.StreamHandler()
+    if settings.log_format == "text":
+        stream.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    _sampling = SamplingFilter()
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    _queue_handler.addFilter(ContextFilter())
+    _queue_handler.addFilter(_sampling)
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.addHandler(_queue_handler)
+    logger.propagate = False
+    apply_logging_settings(settings)
+
+    _listener = QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def apply_logging_settings(settings):
+    """Nível e amostragem podem mudar em runtime (reload); formato e fila não"""
+    logging.getLogger(ROOT_LOGGER).setLevel(settings.log_level)
+    if _sampling is not None:
+        _sampling.default_rate = settings.log_sample_rate
+        _sampling.route_rates = parse_route_rates(settings.log_sample_routes)
+
+
+def shutdown_logging():
+    """Escreve o que ainda está na fila e para a thread de escrita"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    return {
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "sampled_out": _sampling.sampled_out if _sampling else 0,
+    }
+
+
+class RequestContextMiddleware:
+    """Define o request_id de cada request e devolve no header X-Request-ID"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        token = _request_context.set({"request_id": request_id, "scope": scope})
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_context.reset(token)
@@ -0,0 +1,10 @@
+-- Hash de conteúdo (autor + rating + texto normalizados) para deduplicação
+-- de reviews por busca indexada. Calculado pela API na ingestão
+-- (review_dedup.content_hash); linhas antigas são preenchidas por
+-- POST /api/reviews/content-hash/backfill.
+
+alter table public.google_reviews
+    add column if not exists content_hash varchar(32);
+
+create index if not exists google_reviews_content_hash_idx
+    on public.google_reviews (content_hash);
@@ -0,0 +1,277 @@
+"""
+Cliente REST compartilhado do Supabase (PostgREST)
+
+Uma única instância de httpx.AsyncClient vive durante toda a vida da app:
+criada no startup, fechada no shutdown. Todas as rotas do server.py usam
+este cliente, reaproveitando conexões keep-alive em vez de pagar TCP+TLS
+a cada request.
+"""
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+from request_metrics import record_upstream
+
+try:
+    import h2  # noqa: F401 - só verifica se HTTP/2 está disponível
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def quote_value(value) -> str:
+    """Escapa um valor para uso dentro de filtros in.(...) / or=(...) do PostgREST"""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def in_filter(values) -> str:
+    """Monta o filtro `in.(...)` do PostgREST para uma lista de valores"""
+    return f"in.({','.join(quote_value(v) for v in values)})"
+
+
+class SupabaseClient:
+    """Cliente PostgREST com pool de conexões e métricas de ocupação"""
+
+    def __init__(
+        self,
+        url: Optional[str],
+        key: Optional[str],
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        http2: bool = True,
+    ):
+        self.url = (url or "").rstrip("/")
+        self.key = key or ""
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client: Optional[httpx.AsyncClient] = None
+        self._retiring = set()
+        self._auth_headers = {
+            "apikey": self.key,
+            "Authorization": f"Bearer {self.key}",
+        }
+
+        # Circuit breaker opcional (backend_router.CircuitBreaker): recebe o
+        # resultado de cada chamada; respostas 5xx contam como falha
+        self.breaker = None
+
+        # Métricas
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+        self.total_time = 0.0
+
+    @classmethod
+    def from_settings(cls, settings) -> "SupabaseClient":
+        """Monta o cliente a partir da configuração tipada (settings.Settings)"""
+        client = cls(
+            url=settings.supabase_url,
+            key=settings.supabase_service_role_key,
+            max_connections=settings.supabase_max_connections,
+            max_keepalive_connections=settings.supabase_max_keepalive,
+            keepalive_expiry=settings.supabase_keepalive_expiry,
+            timeout=settings.supabase_timeout,
+            connect_timeout=settings.supabase_connect_timeout,
+            http2=settings.supabase_http2,
+        )
+        client._auth_headers = settings.supabase_auth_headers
+        return client
+
+    async def apply_settings(self, settings):
+        """
+        Aplica uma configuração recarregada (SIGHUP)
+        Troca de chave só atualiza os headers; mudança de URL, pool ou timeouts
+        abre um pool novo e fecha o antigo depois que as chamadas em curso terminarem
+        """
+        rebuild = (
+            settings.supabase_url != self.url
+            or settings.supabase_max_connections != self.max_connections
+            or settings.supabase_max_keepalive != self.max_keepalive_connections
+            or settings.supabase_keepalive_expiry != self.keepalive_expiry
+            or settings.supabase_timeout != self.timeout
+            or settings.supabase_connect_timeout != self.connect_timeout
+            or (settings.supabase_http2 and HTTP2_AVAILABLE) != self.http2
+        )
+        self.url = settings.supabase_url
+        self.key = settings.supabase_service_role_key
+        self._auth_headers = settings.supabase_auth_headers
+        self.max_connections = settings.supabase_max_connections
+        self.max_keepalive_connections = settings.supabase_max_keepalive
+        self.keepalive_expiry = settings.supabase_keepalive_expiry
+        self.timeout = settings.supabase_timeout
+        self.connect_timeout = settings.supabase_connect_timeout
+        self.http2 = settings.supabase_http2 and HTTP2_AVAILABLE
+
+        if rebuild and self._client is not None:
+            old_client = self._client
+            self._client = None
+            await self.start()
+            self._retiring.add(old_client)
+            asyncio.get_running_loop().call_later(
+                self.timeout, lambda: asyncio.ensure_future(self._close_retired(old_client))
+            )
+
+    async def _close_retired(self, old_client: httpx.AsyncClient):
+        if old_client in self._retiring:
+            self._retiring.discard(old_client)
+            await old_client.aclose()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url and self.key)
+
+    @property
+    def rest_url(self) -> str:
+        return f"{self.url}/rest/v1"
+
+    def headers(self, extra: Optional[dict] = None) -> dict:
+        """Headers de autenticação do PostgREST (+ extras opcionais)"""
+        if not extra:
+            return self._auth_headers
+        return {**self._auth_headers, **extra}
+
+    async def start(self):
+        """Abre o pool de conexões (chamado no startup da app)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.rest_url,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            )
+
+    async def close(self):
+        """Fecha o pool de conexões (chamado no shutdown da app)"""
+        for old_client in list(self._retiring):
+            await self._close_retired(old_client)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("SupabaseClient não iniciado - chame start() no startup")
+        return self._client
+
+    async def request(
+        self,
+        method: str,
+        table: str,
+        *,
+        params=None,
+        json=None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """
+        Executa uma chamada PostgREST em /rest/v1/{table}
+        `timeout` sobrescreve o timeout padrão apenas para esta chamada
+        """
+        if self._client is None:
+            # Uso fora do ciclo de vida da app (scripts, testes): abre sob demanda
+            await self.start()
+
+        kwargs = {
+            "params": params,
+            "json": json,
+            "headers": self.headers(headers),
+        }
+        if timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=min(timeout, self.connect_timeout))
+
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, f"/{table}", **kwargs)
+        except Exception as e:
+            self.total_errors += 1
+            if self.breaker is not None:
+                self.breaker.record(False, time.perf_counter() - started, str(e) or type(e).__name__)
+            raise
+        else:
+            if self.breaker is not None:
+                failed = response.status_code >= 500
+                self.breaker.record(not failed, time.perf_counter() - started, f"HTTP {response.status_code}" if failed else None)
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight -= 1
+            self.total_time += elapsed
+            record_upstream("supabase", elapsed)
+
+    async def ping(self, table: str, timeout: float = 3.0):
+        """
+        Consulta mínima para o probe do circuit breaker
+        Não entra nas métricas nem no breaker; levanta exceção se o Supabase falhar
+        """
+        if self._client is None:
+            await self.start()
+        response = await self.client.get(
+            f"/{table}",
+            params={"select": "id", "limit": "1"},
+            headers=self.headers(),
+            timeout=timeout,
+        )
+        if response.status_code >= 500:
+            raise Exception(f"HTTP {response.status_code}")
+
+    async def get(self, table: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", table, **kwargs)
+
+    async def post(self, table: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", table, **kwargs)
+
+    async def patch(self, table: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", table, **kwargs)
+
+    async def delete(self, table: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", table, **kwargs)
+
+    def pool_stats(self) -> dict:
+        """Ocupação do pool e contadores de uso"""
+        connections = 0
+        idle_connections = 0
+        if self._client is not None:
+            # httpcore não expõe isso publicamente; leitura defensiva
+            pool = getattr(self._client._transport, "_pool", None)
+            for conn in getattr(pool, "connections", []) or []:
+                connections += 1
+                try:
+                    if conn.is_idle():
+                        idle_connections += 1
+                except Exception:
+                    pass
+
+        return {
+            "configured": self.configured,
+            "open": self._client is not None,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "connections": connections,
+            "idle_connections": idle_connections,
+            "active_connections": connections - idle_connections,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+            "avg_latency_ms": round(self.total_time / self.total_requests * 1000, 2) if self.total_requests else 0.0,
+        }